@@ -2,15 +2,111 @@ import tkinter as tk
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.widgets import Button
+from workload import WORKLOAD_KINDS, generate_workload
+from trace_cache import trace_cache, trace_key
+from step_worker import StepWorker
+from profiler import PROFILER_KEY, RenderProfiler
+from viewport import Viewport
+from kernels import NUM_BUCKETS, MAX_SPLIT_DEPTH, split_threshold, bucket_index
+from ingest import CHUNK_SIZE, ArrayBuffer, iter_values
+
+
+def bucket_sort_steps(arr):
+    # Yields the steps of a bucket sort over arr for the visualizer to replay. The buckets are offset
+    # ranges of one contiguous array of arr's dtype, not lists of boxed ints.
+    arr = np.asarray(arr)
+    max_value = int(arr.max())
+    min_value = int(arr.min())
+    threshold = split_threshold(len(arr))
+
+    # Size the buckets first so they can be laid out back to back
+    counts = bucket_counts(arr, min_value, max_value)
+    starts = np.concatenate(([0], np.cumsum(counts)))
+    yield "start", NUM_BUCKETS, counts.tolist()
+
+    # Distribute elements into buckets
+    data = np.empty_like(arr)
+    fill = starts[:-1].copy()
+    for num in iter_values(arr):
+        index = bucket_index(num, min_value, max_value)
+        data[fill[index]] = num
+        fill[index] += 1
+        yield "fill", index, num
+
+    # Measure how skewed the distribution was before sorting
+    yield "occupancy", counts.tolist(), threshold
+
+    # Sort each bucket in place, re-bucketing the overloaded ones on their own range
+    for i in range(NUM_BUCKETS):
+        bucket = data[starts[i]:starts[i + 1]]
+        yield from _sort_bucket_steps(bucket, (i,), threshold)
+        yield "sort", i, bucket.copy()
+
+    # Concatenate buckets
+    for i in range(NUM_BUCKETS):
+        yield "merge", i
+
+    yield "done",
+
+
+def bucket_counts(arr, min_value, max_value):
+    counts = np.zeros(NUM_BUCKETS, dtype=np.int64)
+    for start in range(0, len(arr), CHUNK_SIZE):
+        chunk = arr[start:start + CHUNK_SIZE].astype(np.int64)  # Widened per chunk so the offsets cannot overflow
+        counts += np.bincount(bucket_index(chunk, min_value, max_value), minlength=NUM_BUCKETS)
+    return counts
+
+
+def _sort_bucket_steps(bucket, path, threshold):
+    # Sorts the bucket view in place
+    if len(bucket) <= threshold or len(path) > MAX_SPLIT_DEPTH:
+        bucket.sort(kind="stable")
+        return
+    min_value = int(bucket.min())
+    max_value = int(bucket.max())
+    if min_value == max_value:
+        return  # All equal, already sorted
+
+    ids = bucket_index(bucket.astype(np.int64), min_value, max_value)
+    counts = np.bincount(ids, minlength=NUM_BUCKETS)
+    yield "split", path, counts.tolist()
+
+    # Regroup so each sub-bucket is a consecutive range of the same view
+    bucket[:] = bucket[np.argsort(ids, kind="stable")]
+    starts = np.concatenate(([0], np.cumsum(counts)))
+    for j in range(NUM_BUCKETS):
+        yield from _sort_bucket_steps(bucket[starts[j]:starts[j + 1]], path + (j,), threshold)
+
+
+def filled_window(data, starts, fill, start, end):
+    # The filled part of every bucket (data[starts[b]:fill[b]]) concatenated, sliced to [start, end)
+    window = []
+    offset = 0
+    for b in range(len(fill)):
+        size = fill[b] - starts[b]
+        if offset >= end:
+            break
+        if offset + size > start:
+            window.append(data[starts[b] + max(0, start - offset):starts[b] + min(size, end - offset)])
+        offset += size
+    return np.concatenate(window) if window else data[:0]
 
 class BucketSortVisualizer:
-    def __init__(self, array_type="random", on_back_callback=None):
+    workload_defaults = {}
+    workload_kinds = WORKLOAD_KINDS
+
+    def __init__(self, array_type="random", on_back_callback=None, workload=None, array=None):
         self.on_back_callback = on_back_callback
         self.paused = False
-        self.fig, self.ax = plt.subplots()
+        # Array on top, bucket occupancy histogram below
+        self.fig, (self.ax, self.hist_ax) = plt.subplots(2, 1, gridspec_kw={'height_ratios': [3, 1]})
         self.fig.canvas.manager.window.state('zoomed')  # Maximize window
         self.text = self.fig.text(0.02, 0.02, "", fontsize=10, color="black")
         self.interval = 1.0  # Default execution speed
+        self.worker = None
+        self.timer = None
+        self.key_cid = None
+        self.profiler = RenderProfiler("bucket")
 
         self.create_back_button()  # Always visible back button
 
@@ -18,6 +114,14 @@ class BucketSortVisualizer:
             self.original_array = np.random.randint(1, 100, np.random.randint(5, 10))
             self.arr = self.original_array.copy()
             self.init_visualization()
+        elif array_type == "workload":
+            self.original_array = generate_workload(**{**self.workload_defaults, **(workload or {})})
+            self.arr = self.original_array.copy()
+            self.init_visualization()
+        elif array_type == "array":
+            self.original_array = np.asarray(array)
+            self.arr = self.original_array.copy()
+            self.init_visualization()
         elif array_type == "custom":
             self.arr = []
             self.get_custom_array()
@@ -28,6 +132,11 @@ class BucketSortVisualizer:
         self.back_button.on_clicked(self.on_back_clicked)
 
     def init_visualization(self):
+        self.profiler.attach(self.fig)
+        self.viewport = Viewport(self.fig, self.arr, on_change=self.redraw)
+        self.y_max = int(np.max(self.arr))  # Fixed up front so a frame never has to scan every bucket
+        self.y_min = min(0, int(np.min(self.arr)))  # Negative values get bars below the axis
+        self.frame = None
         self.ax.set_title('Initial Array')
         self.plot_bars()
 
@@ -36,8 +145,10 @@ class BucketSortVisualizer:
                                                 "Press 1 for Slow speed\nPress 2 for Medium speed\nPress 3 for Fast speed",
                                                 ha='center', va='center', fontsize=10, color='blue')
 
-        # Connect events for speed selection and pause/resume
-        self.fig.canvas.mpl_connect('key_press_event', self.on_key_press)
+        # Connect events for speed selection and pause/resume (once, Restart reuses the figure)
+        if self.key_cid is not None:
+            self.fig.canvas.mpl_disconnect(self.key_cid)
+        self.key_cid = self.fig.canvas.mpl_connect('key_press_event', self.on_key_press)
         self.speed_choice = 2  # Default speed (medium)
 
         # Add "Restart" button
@@ -48,16 +159,21 @@ class BucketSortVisualizer:
         self.run_algorithm()
 
     def plot_bars(self):
-        self.ax.clear()
-        self.bars = self.ax.bar(range(len(self.arr)), self.arr, color='skyblue',
-                                align='center')  # Set initial color to 'skyblue'
-        for bar in self.bars:
-            height = bar.get_height()
-            self.ax.text(bar.get_x() + bar.get_width() / 2., height + 1, '%d' % int(height), ha='center', va='bottom',
-                         fontsize=8, color='black')
-        plt.xticks(range(len(self.arr)), [str(x) for x in self.arr])
-        plt.ylim(0, max(self.arr) + 10)  # Adjust y-axis limit dynamically
-        plt.pause(self.interval)
+        with self.profiler.stage("clear"):
+            self.ax.clear()
+        with self.profiler.stage("bars"):
+            # Only the viewport's window is drawn
+            start, end = self.viewport.start, self.viewport.end
+            window = self.viewport.window(self.arr)
+            self.bars = self.ax.bar(range(start, end), window, color='skyblue',
+                                    align='center')  # Set initial color to 'skyblue'
+            if self.viewport.show_labels:
+                for bar in self.bars:
+                    height = bar.get_height()
+                    self.ax.text(bar.get_x() + bar.get_width() / 2., height + 1, '%d' % int(height), ha='center',
+                                 va='bottom', fontsize=8, color='black')
+                self.ax.set_xticks(range(start, end), [str(x) for x in window])
+            self.ax.set_ylim(self.y_min, self.y_max + 10)
 
     def on_key_press(self, event):
         if event.key == '1':
@@ -78,78 +194,101 @@ class BucketSortVisualizer:
         elif event.key == 'r':
             self.paused = False
             self.update_speed_message("Resumed. Current speed: Medium")
+        elif event.key == PROFILER_KEY:
+            self.profiler.toggle()
+        elif self.viewport.on_key(event.key):  # Arrows pan, +/- zoom, 'f' follows the current bucket
+            self.redraw()
+
+        if self.timer is not None:
+            self.timer.interval = int(self.interval * 1000)
 
     def update_speed_message(self, message):
         self.speed_instructions.set_text(message)
 
-    def bucket_sort(self):
-        max_value = max(self.arr)
-        num_buckets = 10  # Number of buckets to use
-
-        # Create empty buckets
-        buckets = [[] for _ in range(num_buckets)]
-
-        # Distribute elements into buckets
-        for num in self.arr:
-            index = num // 10  # Each bucket range is 10
-            buckets[index].append(num)
-
-            # Visualize each bucket being filled
-            self.visualize_bucket(buckets, index, filling=True)
-            self.wait_if_paused()
-
-        # Sort each bucket and visualize
-        for i in range(num_buckets):
-            buckets[i] = sorted(buckets[i])
-
-            # Visualize sorting of each bucket
-            self.visualize_bucket(buckets, i, sorting=True)
-            self.wait_if_paused()
-
-        # Concatenate buckets and visualize
-        result = []
-        for bucket in buckets:
-            result.extend(bucket)
-
-            # Visualize merging of buckets
-            self.visualize_bucket(buckets, idx=None, sorting=False, merging=True)
-            self.wait_if_paused()
-
-        self.arr = result
-
-    def wait_if_paused(self):
-        while self.paused:
-            plt.pause(0.1)
-
-    def visualize_bucket(self, buckets, idx, filling=False, sorting=False, merging=False):
-        self.ax.clear()
-        flattened = [item for sublist in buckets for item in sublist]
-        self.bars = self.ax.bar(range(len(flattened)), flattened, color='skyblue', align='center')
-
-        # Highlight the current bucket being processed
-        colors = ['skyblue'] * len(flattened)
-        if filling:
-            start = sum(len(buckets[i]) for i in range(idx))
-            end = start + len(buckets[idx])
-            for i in range(start, end):
-                colors[i] = 'gold'
-        elif sorting:
-            start = sum(len(buckets[i]) for i in range(idx))
-            end = start + len(buckets[idx])
-            for i in range(start, end):
-                colors[i] = 'lightgreen'
-        elif merging:
-            colors = ['lightgreen'] * len(flattened)
-
-        for bar, color in zip(self.bars, colors):
-            bar.set_color(color)
-
-        for bar in self.bars:
-            height = bar.get_height()
-            self.ax.text(bar.get_x() + bar.get_width() / 2., height + 1, '%d' % int(height), ha='center', va='bottom',
-                         fontsize=8, color='black')
-
-        plt.ylim(0, max(flattened) + 10)
+    def apply_step(self, step):
+        # Replay one step of the trace onto self.data and draw it. Bucket b is self.data[starts[b]:starts[b + 1]],
+        # filled up to fill[b].
+        kind = step[0]
+        if kind == "start":
+            _, num_buckets, counts = step
+            self.starts = np.concatenate(([0], np.cumsum(counts)))
+            self.fill = self.starts[:-1].copy()
+            self.data = np.empty_like(self.original_array)
+        elif kind == "fill":
+            _, index, num = step
+            self.data[self.fill[index]] = num
+            self.fill[index] += 1
+            self.follow_bucket(index)
+            self.visualize_bucket(index, filling=True)  # Visualize each bucket being filled
+        elif kind == "sort":
+            _, index, values = step
+            start, end = self.follow_bucket(index)
+            self.data[start:end] = values
+            self.viewport.update_minimap(self.data, start, end - 1)
+            self.visualize_bucket(index, sorting=True)  # Visualize sorting of each bucket
+        elif kind == "occupancy":
+            _, counts, self.split_threshold = step
+            # Every bucket is full now, so self.data is the concatenation and the minimap can track it in place
+            self.viewport.refresh_minimap(self.data)
+            self.plot_occupancy(counts, 'Bucket occupancy')
+            self.profiler.draw()
+        elif kind == "split":
+            # A bucket over the load threshold is re-bucketed on its own min/max
+            _, path, counts = step
+            label = '.'.join(str(i + 1) for i in path)
+            self.plot_occupancy(counts, f'Sub-buckets of bucket {label}')
+            self.follow_bucket(path[0])
+            self.visualize_bucket(path[0],
+                                  splitting=f'Splitting bucket {label}: {sum(counts)} elements over the '
+                                            f'threshold of {self.split_threshold}')
+        elif kind == "merge":
+            self.follow_bucket(step[1])
+            self.visualize_bucket(idx=None, sorting=False, merging=True)  # Visualize merging of buckets
+        elif kind == "done":
+            self.arr = self.data.copy()
+
+    def bucket_range(self, idx):
+        # Position of bucket idx in the concatenation of what has been filled so far
+        sizes = self.fill - self.starts[:-1]
+        start = int(sizes[:idx].sum())
+        return start, start + int(sizes[idx])
+
+    def follow_bucket(self, idx):
+        start, end = self.bucket_range(idx)
+        self.viewport.show(start, max(start, end - 1))
+        return start, end
+
+    def visualize_bucket(self, idx, filling=False, sorting=False, merging=False, splitting=None):
+        self.frame = (idx, filling, sorting, merging, splitting)
+        with self.profiler.stage("clear"):
+            self.ax.clear()
+        with self.profiler.stage("bars"):
+            # Only the part of the concatenated buckets inside the viewport is gathered and drawn
+            view_start = self.viewport.start
+            window = filled_window(self.data, self.starts, self.fill, view_start, self.viewport.end)
+            self.bars = self.ax.bar(range(view_start, view_start + len(window)), window, color='skyblue',
+                                    align='center')
+
+            # Highlight the current bucket being processed
+            colors = ['skyblue'] * len(window)
+            if filling or sorting or splitting:
+                start, end = self.bucket_range(idx)
+                color = 'gold' if filling else 'lightgreen' if sorting else 'salmon'
+                for i in range(max(start, view_start), min(end, view_start + len(window))):
+                    colors[i - view_start] = color
+            elif merging:
+                colors = ['lightgreen'] * len(window)
+
+            for bar, color in zip(self.bars, colors):
+                bar.set_color(color)
+
+            if self.viewport.show_labels:
+                for bar in self.bars:
+                    height = bar.get_height()
+                    self.ax.text(bar.get_x() + bar.get_width() / 2., height + 1, '%d' % int(height), ha='center',
+                                 va='bottom', fontsize=8, color='black')
+
+            self.ax.set_ylim(self.y_min, self.y_max + 10)
 
         if filling:
             self.ax.set_title(f'Filling bucket {idx + 1}')
@@ -157,30 +296,96 @@ class BucketSortVisualizer:
             self.ax.set_title(f'Sorting bucket {idx + 1}')
         elif merging:
             self.ax.set_title('Merging buckets')
+        elif splitting:
+            self.ax.set_title(splitting)
+
+        self.text.set_text(self.viewport.status([int(item) for item in window]))
+        self.profiler.draw()
+
+    def redraw(self):
+        # Re-render the current frame after the viewport was panned or zoomed
+        if self.frame is None:
+            self.plot_bars()
+            self.text.set_text(self.viewport.status([int(item) for item in self.viewport.window(self.arr)]))
+            self.profiler.draw()
+        else:
+            self.visualize_bucket(*self.frame)
+        if self.worker is not None and self.worker.finished:
+            self.show_sorted()
 
-        self.text.set_text(f'Current Array: {[int(item) for item in flattened]}')
-        self.fig.canvas.draw()
-        plt.pause(self.interval)
+    def show_sorted(self):
+        self.ax.set_title('Sorted Array')
+        self.text.set_text(self.viewport.status([int(item) for item in self.viewport.window(self.arr)], 'Sorted Array'))
+        self.fig.canvas.draw_idle()
+
+    def plot_occupancy(self, counts, title):
+        with self.profiler.stage("bars"):
+            self.hist_ax.clear()
+            colors = ['salmon' if count > self.split_threshold else 'skyblue' for count in counts]
+            self.hist_ax.bar(range(len(counts)), counts, color=colors, align='center')
+            self.hist_ax.axhline(self.split_threshold, color='red', linestyle='--', linewidth=1)
+            self.hist_ax.set_xticks(range(len(counts)), [str(i + 1) for i in range(len(counts))])
+            self.hist_ax.set_title(title, fontsize=9)
 
     def run_algorithm(self):
         plt.waitforbuttonpress()
 
-        self.bucket_sort()
-
-        sorted_array_text = ', '.join(map(str, map(int, self.arr)))
-        self.ax.set_title('Sorted Array')
-        self.text.set_text(f'Sorted Array: [{sorted_array_text}]')
-        self.fig.canvas.draw()
+        arr = np.array(self.arr)
+        key = trace_key("bucket", "ranges", arr)  # "start" steps carry the bucket sizes
+
+        # The sort runs on a worker thread; a timer on the figure draws one step per tick
+        self.worker = StepWorker(lambda: trace_cache.steps(key, lambda: bucket_sort_steps(arr)))
+        self.worker.start()
+        self.timer = self.fig.canvas.new_timer(interval=int(self.interval * 1000))
+        self.timer.add_callback(self.on_timer)
+        self.timer.start()
+
+    def on_timer(self):
+        if self.paused or self.worker is None:
+            return
+        try:
+            step = self.worker.poll()
+        except Exception as error:  # Raised by the sort on the worker thread
+            self.show_error(error)
+            return
+        if step is not None:
+            self.profiler.begin_frame(self.worker)
+            self.apply_step(step)
+            self.profiler.end_frame()
+        elif self.worker.finished:
+            self.timer.stop()
+            self.show_sorted()
+
+    def show_error(self, error):
+        # An exception escaping the timer callback would kill the timer and freeze the figure silently
+        self.stop_algorithm()
+        self.ax.set_title(f'Sorting failed: {error}', color='red')
+        self.update_speed_message(f"Sorting failed ({type(error).__name__}). Press Restart to try again.")
+        self.fig.canvas.draw_idle()
+
+    def stop_algorithm(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
 
     def on_back_clicked(self, event):
+        self.stop_algorithm()
+        self.profiler.close()
         plt.close(self.fig)
         if self.on_back_callback:
             self.on_back_callback()
 
     def on_restart_clicked(self, event):
+        self.stop_algorithm()
         self.arr = self.original_array.copy()
+        self.viewport.close()
         self.ax.clear()
+        self.hist_ax.clear()
         self.fig.texts.clear()  # Clear all existing text from the figure
+        self.text = self.fig.text(0.02, 0.02, "", fontsize=10, color="black")
         self.init_visualization()  # Restart the visualization with the same array
 
     def get_custom_array(self):
@@ -206,7 +411,7 @@ class BucketSortVisualizer:
 
     def submit_length(self):
         self.array_length = int(self.array_length_entry.get())
-        self.arr = []
+        self.buffer = ArrayBuffer(self.array_length)  # Typed, preallocated; widened only if a value needs it
 
         self.root.destroy()
         self.enter_elements_one_by_one()
@@ -235,7 +440,7 @@ class BucketSortVisualizer:
 
     def submit_element(self):
         element = int(self.element_entry.get())
-        self.arr.append(element)
+        self.buffer.append(element)
         self.element_index += 1
 
         if self.element_index < self.array_length:
@@ -243,7 +448,8 @@ class BucketSortVisualizer:
             self.element_entry.delete(0, tk.END)
         else:
             self.root.destroy()
-            self.original_array = np.array(self.arr)
+            self.original_array = self.buffer.array()
+            self.arr = self.original_array.copy()
             self.init_visualization()
 
     def center_window(self, window, width, height):
@@ -2,16 +2,73 @@ import tkinter as tk
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.widgets import Button
+from workload import WORKLOAD_KINDS, generate_workload
+from trace_cache import trace_cache, trace_key
+from step_worker import StepWorker
+from profiler import PROFILER_KEY, RenderProfiler
+from viewport import Viewport
+from ingest import ArrayBuffer, iter_values
+
+MAX_COUNT_RANGE = 10 ** 6  # The count array has one slot per value between min and max
+
+
+def counting_sort_steps(arr):
+    # Yields the steps of a counting sort over arr for the visualizer to replay
+    arr = np.asarray(arr)  # Kept in its compact dtype; values are boxed a chunk at a time
+    max_val = int(arr.max())
+    min_val = int(arr.min())
+    range_val = max_val - min_val + 1
+    if range_val > MAX_COUNT_RANGE:
+        raise ValueError(f"Value range {range_val} is too wide for counting sort (limit {MAX_COUNT_RANGE}).")
+
+    count = [0] * range_val
+    yield "start", min_val, range_val
+
+    # Count frequencies of each element
+    for num in iter_values(arr):
+        count[num - min_val] += 1
+        yield "count", num - min_val
+
+    # Indicate transition to cumulative count
+    yield "phase", "Transition to Cumulative Count"
+
+    # Calculate cumulative counts
+    for i in range(1, len(count)):
+        count[i] += count[i - 1]
+        yield "cumulative", i
+
+    # Display cumulative count array before placing elements
+    yield "phase", "Cumulative Count Array"
+
+    # Place the elements in sorted order
+    for num in iter_values(arr, reverse=True):
+        count[num - min_val] -= 1
+        yield "place", num, count[num - min_val]
+
+    # Copy the sorted elements back to the original array
+    for i in range(len(arr)):
+        yield "copy", i
+
+    yield "sorted",
+
 
 class CountingSortVisualizer:
-    def __init__(self, array_type="random", on_back_callback=None):
+    workload_defaults = {"high": 20}  # Same value range as random arrays
+    workload_kinds = [kind for kind in WORKLOAD_KINDS if kind != "wide_range"]  # Its range ignores low/high
+
+    def __init__(self, array_type="random", on_back_callback=None, workload=None, array=None):
         self.on_back_callback = on_back_callback
         self.paused = False
         self.sorted = False
-        self.fig, self.ax = plt.subplots()
+        # Input array on top, then the count/cumulative array and the output array in their own panels
+        self.fig, (self.ax, self.count_ax, self.output_ax) = plt.subplots(3, 1, gridspec_kw={'height_ratios': [2, 1, 1]})
         self.fig.canvas.manager.window.state('zoomed')  # Maximize window
         self.text = self.fig.text(0.02, 0.02, "", fontsize=10, color="black")
         self.interval = 1.0  # Default execution speed
+        self.worker = None
+        self.timer = None
+        self.key_cid = None
+        self.profiler = RenderProfiler("counting")
 
         # Initialize buttons
         self.init_buttons()
@@ -20,13 +77,28 @@ class CountingSortVisualizer:
             self.original_array = np.random.randint(1, 20, np.random.randint(5, 10))  # Random array for visualization
             self.arr = self.original_array.copy()
             self.init_visualization()
+        elif array_type == "workload":
+            self.original_array = generate_workload(**{**self.workload_defaults, **(workload or {})})
+            self.arr = self.original_array.copy()
+            self.init_visualization()
+        elif array_type == "array":
+            self.original_array = np.asarray(array)
+            self.arr = self.original_array.copy()
+            self.init_visualization()
         elif array_type == "custom":
             self.arr = []
             self.get_custom_array()
         else:
-            raise ValueError("Invalid array type. Choose 'random' or 'custom'.")
+            raise ValueError("Invalid array type. Choose 'random', 'workload', 'array' or 'custom'.")
 
     def init_visualization(self):
+        self.profiler.attach(self.fig)
+        self.viewport = Viewport(self.fig, self.arr, on_change=self.redraw)  # Shared by the input and output panels
+        self.y_max = int(np.max(self.arr))
+        self.y_min = min(0, int(np.min(self.arr)))  # Negative values get bars below the axis
+        self.bar_color = 'skyblue'  # Default blue for initial state
+        self.output = None
+        self.phase = 'Initial Array'
         self.ax.set_title('Initial Array')
         self.plot_bars()
 
@@ -35,26 +107,33 @@ class CountingSortVisualizer:
             "Press 1 for Slow speed\nPress 2 for Medium speed\nPress 3 for Fast speed",
             ha='center', va='center', fontsize=10, color='blue')
 
-        # Connect events for speed selection and pause/resume
-        self.fig.canvas.mpl_connect('key_press_event', self.on_key_press)
+        # Connect events for speed selection and pause/resume (once, Restart reuses the figure)
+        if self.key_cid is not None:
+            self.fig.canvas.mpl_disconnect(self.key_cid)
+        self.key_cid = self.fig.canvas.mpl_connect('key_press_event', self.on_key_press)
         self.speed_choice = 2  # Default speed (medium)
 
         self.run_algorithm()
 
     def plot_bars(self):
-        self.ax.clear()
-        if self.sorted:
-            colors = ['#4CAF50'] * len(self.arr)  # Green color for sorted state
-        else:
-            colors = ['skyblue'] * len(self.arr)  # Default blue for initial state
-        self.bars = self.ax.bar(range(len(self.arr)), self.arr, color=colors, align='center')
-        for bar in self.bars:
-            height = bar.get_height()
-            self.ax.text(bar.get_x() + bar.get_width() / 2., height + 0.1, '%d' % int(height), ha='center', va='bottom',
-                         fontsize=8, color='black')
-        plt.xticks(range(len(self.arr)), [str(x) for x in self.arr])
-        plt.ylim(0, max(self.arr) + 3)  # Adjust y-axis limit dynamically
-        plt.pause(self.interval)
+        with self.profiler.stage("clear"):
+            self.ax.clear()
+        with self.profiler.stage("bars"):
+            if self.sorted:
+                self.bar_color = '#4CAF50'  # Green color for sorted state
+            # Only the viewport's window is drawn; self.bars[j] is element self.viewport.start + j
+            start, end = self.viewport.start, self.viewport.end
+            window = self.viewport.window(self.arr)
+            self.bars = self.ax.bar(range(start, end), window, color=self.bar_color, align='center')
+            self.labels = []
+            if self.viewport.show_labels:
+                for bar in self.bars:
+                    height = bar.get_height()
+                    self.labels.append(self.ax.text(bar.get_x() + bar.get_width() / 2., height + 0.1,
+                                                    '%d' % int(height), ha='center', va='bottom', fontsize=8,
+                                                    color='black'))
+                self.ax.set_xticks(range(start, end), [str(x) for x in window])
+            self.ax.set_ylim(self.y_min, self.y_max + 3)
 
     def on_key_press(self, event):
         if event.key == '1':
@@ -75,107 +154,214 @@ class CountingSortVisualizer:
         elif event.key == 'r':
             self.paused = False
             self.update_speed_message(f"Resumed. Current speed: {['Slow', 'Medium', 'Fast'][self.speed_choice - 1]}")
+        elif event.key == PROFILER_KEY:
+            self.profiler.toggle()
+        elif self.viewport.on_key(event.key):  # Arrows pan, +/- zoom, 'f' follows the current index
+            self.redraw()
+
+        if self.timer is not None:
+            self.timer.interval = int(self.interval * 1000)
 
     def update_speed_message(self, message):
         self.speed_instructions.set_text(message)
 
-    def counting_sort(self):
-        max_val = max(self.arr)
-        min_val = min(self.arr)
-        range_val = max_val - min_val + 1
-
-        count = [0] * range_val
-        output = [0] * len(self.arr)
-
-        self.visualize(phase="Starting Counting Sort")
-
-        # Count frequencies of each element
-        for num in self.arr:
-            count[num - min_val] += 1
-            self.visualize(count=count, phase="Count Array")
-            self.wait_if_paused()
-
-        # Indicate transition to cumulative count
-        self.ax.set_title('Transition to Cumulative Count')
-        self.fig.canvas.draw()
-        plt.pause(self.interval)
-
-        # Calculate cumulative counts
-        for i in range(1, len(count)):
-            count[i] += count[i - 1]
-            self.visualize(count=count, phase="Cumulative Array")
-            self.wait_if_paused()
-
-        # Display cumulative count array before placing elements
-        self.ax.set_title('Cumulative Count Array')
-        self.fig.canvas.draw()
-        plt.pause(self.interval)
-
-        # Place the elements in sorted order
-        for num in reversed(self.arr):
-            output[count[num - min_val] - 1] = num
-            count[num - min_val] -= 1
-            self.visualize(output=output, phase=f"Placing {num} at index {count[num - min_val]}")
-            self.wait_if_paused()
-
-        # Copy the sorted elements back to the original array
-        for i in range(len(self.arr)):
-            self.arr[i] = output[i]
-            self.visualize(output=output, phase="Final Sorting")
-            self.wait_if_paused()
-
-        self.sorted = True
-        self.visualize(phase="Sorted Array")  # Update to show final sorted state
-
-    def wait_if_paused(self):
-        while self.paused:
-            plt.pause(0.1)
-
-    def visualize(self, count=None, output=None, phase="Initial Array"):
+    def apply_step(self, step):
+        # Replay one step of the trace; each step touches only the one bar it changes
+        kind = step[0]
+        if kind == "start":
+            _, self.min_val, range_val = step
+            self.count = [0] * range_val
+            self.output = np.zeros_like(self.arr)
+            self.placed = np.zeros(len(self.arr), dtype=bool)
+            self.init_panels(range_val)
+            self.text.set_text(self.viewport.status(self.viewport.window(self.arr)))
+            self.set_phase("Starting Counting Sort", 'skyblue')
+        elif kind == "count":
+            i = step[1]
+            self.count[i] += 1
+            self.update_count_bar(i)
+            self.set_phase("Count Array", 'gold')  # Yellow for counting phase
+        elif kind == "phase":
+            self.set_phase(step[1])
+        elif kind == "cumulative":
+            i = step[1]
+            self.count[i] += self.count[i - 1]
+            self.update_count_bar(i)
+            self.set_phase("Cumulative Array", 'gold')
+        elif kind == "place":
+            _, num, pos = step
+            self.output[pos] = num
+            self.placed[pos] = True
+            self.count[num - self.min_val] -= 1
+            self.update_count_bar(num - self.min_val)
+            if self.viewport.show(pos):
+                self.redraw_window()  # Rebuilt from self.output, so the new bar is already in place
+            elif self.viewport.visible(pos):
+                with self.profiler.stage("bars"):
+                    self.output_bars[pos - self.viewport.start].set_height(num)
+                    self.output_bars[pos - self.viewport.start].set_color('lightgreen')
+            self.set_phase(f"Placing {num} at index {pos}", 'skyblue')
+        elif kind == "copy":
+            i = step[1]
+            self.arr[i] = self.output[i]
+            self.viewport.update_minimap_at(self.arr, i)
+            if self.viewport.show(i):
+                self.redraw_window()
+            elif self.viewport.visible(i):
+                j = i - self.viewport.start
+                with self.profiler.stage("bars"):
+                    self.bars[j].set_height(self.arr[i])
+                    if self.labels:
+                        self.labels[j].set_text('%d' % int(self.arr[i]))
+                        self.labels[j].set_y(self.arr[i] + 0.1)
+            # Only the copy phase changes the input array
+            self.text.set_text(self.viewport.status(self.viewport.window(self.arr)))
+            self.set_phase("Final Sorting")
+        elif kind == "sorted":
+            self.sorted = True
+            self.plot_bars()  # Rebuild once to refresh tick labels and show the final sorted state
+            self.set_phase("Sorted Array", 'lightgreen')
+
+    def init_panels(self, range_val):
+        # The count array gets its own window, which always follows the bucket being updated
+        self.count_viewport = Viewport(self.fig, self.count, minimap=False)
+        self.plot_count_bars()
+        self.plot_output_bars()
+
+    def plot_count_bars(self):
+        with self.profiler.stage("clear"):
+            self.count_ax.clear()
+        with self.profiler.stage("bars"):
+            start, end = self.count_viewport.start, self.count_viewport.end
+            self.count_bars = self.count_ax.bar(range(start, end), self.count_viewport.window(self.count), color='gold',
+                                                align='center')
+            self.count_ax.set_ylim(0, len(self.arr) + 1)  # A cumulative count never exceeds n
+            if end - start <= 50:
+                self.count_ax.set_xticks(range(start, end), [str(self.min_val + i) for i in range(start, end)])
+            self.count_ax.set_title('Count array', fontsize=9)
+            self.highlighted_count = None
+
+    def plot_output_bars(self):
+        with self.profiler.stage("clear"):
+            self.output_ax.clear()
+        with self.profiler.stage("bars"):
+            start, end = self.viewport.start, self.viewport.end
+            colors = ['lightgreen' if placed else 'lightgray' for placed in self.viewport.window(self.placed)]
+            self.output_bars = self.output_ax.bar(range(start, end), self.viewport.window(self.output), color=colors,
+                                                  align='center')
+            self.output_ax.set_ylim(self.y_min, self.y_max + 3)
+            self.output_ax.set_title('Output array', fontsize=9)
+
+    def update_count_bar(self, i):
+        if self.count_viewport.show(i):
+            self.plot_count_bars()
+        with self.profiler.stage("bars"):
+            start = self.count_viewport.start
+            if self.highlighted_count is not None:
+                self.count_bars[self.highlighted_count - start].set_color('gold')
+            self.count_bars[i - start].set_height(self.count[i])
+            self.count_bars[i - start].set_color('orange')  # The bucket that changed in this step
+            self.highlighted_count = i
+
+    def redraw_window(self):
+        # Rebuilds the input and output panels after the viewport moved
         self.plot_bars()
-
-        if count is not None:
-            colors = ['gold'] * len(self.arr)  # Yellow for counting phase
-            for i in range(len(self.arr)):
-                if output is not None and self.arr[i] != output[i]:
-                    colors[i] = 'lightgreen'  # Green for placement phase
-        else:
-            colors = ['skyblue'] * len(self.arr)
-            if self.sorted:
-                colors = ['lightgreen'] * len(self.arr)
-
-        for bar, color in zip(self.bars, colors):
-            bar.set_color(color)
-
-        if count is not None:
-            self.ax.set_title(f'{phase}: {count}')
-        else:
-            self.ax.set_title(phase)
-        self.text.set_text(f'Current Array: {self.arr}')
-        self.fig.canvas.draw()
-        plt.pause(self.interval)
+        self.ax.set_title(self.phase)
+        if self.output is not None:
+            self.plot_output_bars()
+        prefix = 'Sorted Array' if self.worker is not None and self.worker.finished else 'Current Array'
+        self.text.set_text(self.viewport.status(self.viewport.window(self.arr), prefix))
+
+    def redraw(self):
+        self.redraw_window()
+        self.profiler.draw()
+
+    def set_phase(self, phase, color=None):
+        # Input bars are only recoloured when the phase colour changes, not on every step
+        if color is not None and color != self.bar_color:
+            with self.profiler.stage("bars"):
+                for bar in self.bars:
+                    bar.set_color(color)
+            self.bar_color = color
+        self.phase = phase
+        self.ax.set_title(phase)
+        self.profiler.draw()
 
     def run_algorithm(self):
+        # Checked before anything is allocated: a wide range would need a huge count array on both threads
+        range_val = int(np.max(self.arr)) - int(np.min(self.arr)) + 1
+        if range_val > MAX_COUNT_RANGE:
+            self.ax.set_title(f'Value range {range_val} is too wide for counting sort (limit {MAX_COUNT_RANGE})',
+                              color='red')
+            self.fig.canvas.draw_idle()
+            plt.show()
+            return
+
         plt.waitforbuttonpress()
 
-        self.counting_sort()
+        arr = np.array(self.arr)
+        key = trace_key("counting", "standard", arr)
 
-        self.ax.set_title('Sorted Array')
-        self.text.set_text(f'Sorted Array: {self.arr}')
-        self.fig.canvas.draw()
+        # The sort runs on a worker thread; a timer on the figure draws one step per tick
+        self.worker = StepWorker(lambda: trace_cache.steps(key, lambda: counting_sort_steps(arr)))
+        self.worker.start()
+        self.timer = self.fig.canvas.new_timer(interval=int(self.interval * 1000))
+        self.timer.add_callback(self.on_timer)
+        self.timer.start()
 
         plt.show()
 
+    def on_timer(self):
+        if self.paused or self.worker is None:
+            return
+        try:
+            step = self.worker.poll()
+        except Exception as error:  # Raised by the sort on the worker thread
+            self.show_error(error)
+            return
+        if step is not None:
+            self.profiler.begin_frame(self.worker)
+            self.apply_step(step)
+            self.profiler.end_frame()
+        elif self.worker.finished:
+            self.timer.stop()
+            self.phase = 'Sorted Array'
+            self.ax.set_title('Sorted Array')
+            self.text.set_text(self.viewport.status(self.viewport.window(self.arr), 'Sorted Array'))
+            self.fig.canvas.draw_idle()
+
+    def show_error(self, error):
+        # An exception escaping the timer callback would kill the timer and freeze the figure silently
+        self.stop_algorithm()
+        self.ax.set_title(f'Sorting failed: {error}', color='red')
+        self.update_speed_message(f"Sorting failed ({type(error).__name__}). Press Restart to try again.")
+        self.fig.canvas.draw_idle()
+
+    def stop_algorithm(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+
     def on_back_clicked(self, event):
+        self.stop_algorithm()
+        self.profiler.close()
         plt.close(self.fig)
         if self.on_back_callback:
             self.on_back_callback()
 
     def on_restart_clicked(self, event):
+        self.stop_algorithm()
         self.arr = self.original_array.copy()
         self.sorted = False
+        self.viewport.close()
         self.ax.clear()
+        self.count_ax.clear()
+        self.output_ax.clear()
         self.fig.texts.clear()  # Clear all existing text from the figure
+        self.text = self.fig.text(0.02, 0.02, "", fontsize=10, color="black")
         self.init_visualization()  # Restart the visualization with the same array
 
     def init_buttons(self):
@@ -209,8 +395,7 @@ class CountingSortVisualizer:
 
     def submit_length(self):
         self.array_length = int(self.array_length_entry.get())
-        self.arr = [0] * self.array_length  # Initialize the array with zeros
-        self.original_array = self.arr.copy()
+        self.buffer = ArrayBuffer(self.array_length)  # Typed, preallocated; widened only if a value needs it
 
         self.root.destroy()
         self.input_elements()
@@ -235,7 +420,7 @@ class CountingSortVisualizer:
         self.root.mainloop()
 
     def submit_element(self):
-        self.arr[self.element_index] = int(self.element_entry.get())
+        self.buffer.append(int(self.element_entry.get()))
         self.element_index += 1
 
         if self.element_index < self.array_length:
@@ -243,6 +428,8 @@ class CountingSortVisualizer:
             self.element_entry.delete(0, tk.END)
         else:
             self.root.destroy()
+            self.original_array = self.buffer.array()  # Keep the entered values for Restart
+            self.arr = self.original_array.copy()
             self.init_visualization()
 
     def center_window(self, root, width, height):
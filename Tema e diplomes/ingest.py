@@ -0,0 +1,154 @@
+import numpy as np
+
+CHUNK_SIZE = 1 << 16  # Elements converted at a time
+CHUNK_BYTES = 1 << 20  # Bytes of text read at a time
+INT_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def smallest_dtype(low, high):
+    # Narrowest signed integer type that holds every value in [low, high]
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    raise OverflowError(f"Values in [{low}, {high}] do not fit in 64 bits.")
+
+
+def value_range(arr):
+    low = high = None
+    for start in range(0, len(arr), CHUNK_SIZE):
+        chunk = arr[start:start + CHUNK_SIZE]
+        low = int(chunk.min()) if low is None else min(low, int(chunk.min()))
+        high = int(chunk.max()) if high is None else max(high, int(chunk.max()))
+    return low, high
+
+
+def iter_values(arr, reverse=False):
+    # Python ints from an array, boxed one chunk at a time instead of all at once
+    starts = range(0, len(arr), CHUNK_SIZE)
+    for start in reversed(starts) if reverse else starts:
+        chunk = arr[start:start + CHUNK_SIZE].tolist()
+        yield from reversed(chunk) if reverse else chunk
+
+
+def narrow(arr):
+    # Copy of an integer array in the narrowest type that fits, converted one chunk at a time
+    arr = np.asarray(arr)
+    if len(arr) == 0 or arr.dtype.kind not in "iu":
+        return arr
+    dtype = smallest_dtype(*value_range(arr))
+    if dtype == arr.dtype:
+        return arr
+    out = np.empty(arr.shape, dtype=dtype)
+    for start in range(0, len(arr), CHUNK_SIZE):
+        out[start:start + CHUNK_SIZE] = arr[start:start + CHUNK_SIZE]
+    return out
+
+
+class ArrayBuffer:
+    # Preallocated typed buffer for a known number of integers. It starts as int8 and is widened
+    # (at most three times) only when a value does not fit.
+    def __init__(self, length):
+        self.data = np.empty(length, dtype=np.int8)
+        self.size = 0
+        self.low = self.high = None
+
+    def extend(self, values):
+        values = np.asarray(values)
+        if len(values) == 0:
+            return
+        if self.size + len(values) > len(self.data):
+            raise ValueError(f"Buffer holds {len(self.data)} values, got {self.size + len(values)}.")
+        low, high = int(values.min()), int(values.max())
+        self.low = low if self.low is None else min(self.low, low)
+        self.high = high if self.high is None else max(self.high, high)
+        dtype = smallest_dtype(self.low, self.high)
+        if dtype.itemsize > self.data.itemsize:
+            self.data = self.data.astype(dtype)
+        self.data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def append(self, value):
+        self.extend([int(value)])
+
+    def array(self):
+        return self.data[:self.size]
+
+
+def parse_numbers(tokens):
+    # Integers stay exact as int64; a block with any other number is read as float64
+    try:
+        return np.array(tokens, dtype=np.int64)
+    except ValueError:
+        return np.array(tokens, dtype=np.float64)
+
+
+def text_chunks(path, chunk_bytes=CHUNK_BYTES):
+    # Numbers separated by whitespace or commas, parsed one block at a time; a number cut by the block
+    # boundary is carried over to the next block
+    carry = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            block = (carry + block).replace(b",", b" ")
+            cut = max(block.rfind(b" "), block.rfind(b"\n"), block.rfind(b"\t"), block.rfind(b"\r"))
+            carry = block[cut + 1:]
+            values = block[:cut + 1].split()
+            if values:
+                yield parse_numbers(values)
+    if carry.strip():
+        yield parse_numbers(carry.split())
+
+
+def text_columns(path):
+    # Values per line when the first two lines look like rows of a table (same count, more than one);
+    # 1 for a flat list, whether it is one long line or one value per line
+    widths = []
+    with open(path, "rb") as f:
+        while len(widths) < 2:
+            line = f.readline(CHUNK_BYTES)
+            if not line:
+                break
+            if len(line) == CHUNK_BYTES and not line.endswith(b"\n"):
+                return 1  # A line this long is a flat list
+            width = len(line.replace(b",", b" ").split())
+            if width:
+                widths.append(width)
+    return widths[0] if len(widths) == 2 and widths[0] == widths[1] else 1
+
+
+def load_text(path):
+    # Two streaming passes: the first counts the values and finds their range, so the second can fill
+    # an exactly sized buffer of the narrowest type (float64 if any value is not an integer)
+    length = 0
+    low = high = None
+    floating = False
+    for chunk in text_chunks(path):
+        length += len(chunk)
+        floating = floating or chunk.dtype.kind == "f"
+        low = chunk.min() if low is None else min(low, chunk.min())
+        high = chunk.max() if high is None else max(high, chunk.max())
+
+    if floating:
+        dtype = np.float64
+    else:
+        dtype = smallest_dtype(int(low), int(high)) if length else np.int8
+    arr = np.empty(length, dtype=dtype)
+    start = 0
+    for chunk in text_chunks(path):
+        arr[start:start + len(chunk)] = chunk
+        start += len(chunk)
+    return arr
+
+
+def load_npy(path):
+    # Memory-mapped, so only the narrowed copy is ever resident
+    return narrow(np.load(path, mmap_mode="r"))
+
+
+def load_array(path):
+    if path.endswith(".npy"):
+        return load_npy(path)
+    return load_text(path)
@@ -0,0 +1,352 @@
+import numpy as np
+from ingest import CHUNK_SIZE, value_range
+
+try:
+    import numba
+except ImportError:  # Optional: without Numba the NumPy backend is used
+    numba = None
+
+ALGORITHMS = ["merge", "counting", "bucket"]
+INTEGER_ALGORITHMS = ["counting", "bucket"]  # They index by key value, so other keys would be truncated
+# Static preference for automatic selection, not timed on this machine: on 10^6-element inputs NumPy's C
+# timsort beat the compiled merge loops, and the compiled counting sort beat NumPy's radix sort once Numba's
+# first-call compile (about a second, then cached on disk) was paid
+AUTO_BACKENDS = {
+    "merge": ["numpy", "numba", "python"],
+    "counting": ["numba", "numpy", "python"],
+    "bucket": ["numpy", "numba", "python"],
+}
+
+NUM_BUCKETS = 10  # Number of buckets to use at every level
+SPLIT_LOAD_FACTOR = 2.0  # A bucket holding more than this multiple of the average load is split again
+MIN_SPLIT_SIZE = 8  # Buckets this small are always sorted directly
+MAX_SPLIT_DEPTH = 4
+MERGE_RUN = 32  # Run length the compiled merge sort insertion-sorts before merging
+COUNT_ARRAY_LIMIT = 1 << 24  # Slots the python and numba counting kernels may allocate (128 MB of int64)
+
+_verified = {}  # Backend name -> whether it matched the reference, checked once per process
+
+
+def supports_keys(algorithm, keys):
+    return algorithm not in INTEGER_ALGORITHMS or np.asarray(keys).dtype.kind in "iu"
+
+
+def key_span(keys):
+    # Number of distinct values between the smallest and largest key, as a Python int (no overflow)
+    if len(keys) == 0:
+        return 0
+    low, high = value_range(keys)
+    return high - low + 1
+
+
+def split_threshold(n, num_buckets=NUM_BUCKETS):
+    return max(MIN_SPLIT_SIZE, int(SPLIT_LOAD_FACTOR * n / num_buckets))
+
+
+def bucket_index(num, min_value, max_value, num_buckets=NUM_BUCKETS):
+    bucket_range = (max_value - min_value) // num_buckets + 1  # Scale to the data so any value range fits
+    return (num - min_value) // bucket_range
+
+
+# Reference backend: plain Python loops, the same algorithms the visualizers step through
+
+def merge_argsort(keys):
+    # Stable permutation that sorts keys, so records can be reordered with a single gather
+    keys = np.asarray(keys).tolist()
+    order = list(range(len(keys)))
+    _merge_argsort(keys, order, 0, len(order) - 1)
+    return np.array(order, dtype=np.intp)
+
+
+def _merge_argsort(keys, order, l, r):
+    if l < r:
+        m = (l + r) // 2
+        _merge_argsort(keys, order, l, m)
+        _merge_argsort(keys, order, m + 1, r)
+
+        L = order[l:m + 1]
+        R = order[m + 1:r + 1]
+        i = j = 0
+        k = l
+        while i < len(L) and j < len(R):
+            if keys[L[i]] <= keys[R[j]]:  # <= keeps equal keys in input order
+                order[k] = L[i]
+                i += 1
+            else:
+                order[k] = R[j]
+                j += 1
+            k += 1
+        order[k:r + 1] = L[i:] + R[j:]
+
+
+def counting_argsort(keys):
+    # Stable permutation that sorts integer keys, so records can be reordered with a single gather
+    keys = [int(key) for key in keys]
+    if not keys:
+        return np.array([], dtype=np.intp)
+    min_val = min(keys)
+    count = [0] * (max(keys) - min_val + 1)
+
+    for key in keys:
+        count[key - min_val] += 1
+    for i in range(1, len(count)):
+        count[i] += count[i - 1]
+
+    # Walking backwards keeps equal keys in input order
+    order = [0] * len(keys)
+    for i in reversed(range(len(keys))):
+        count[keys[i] - min_val] -= 1
+        order[count[keys[i] - min_val]] = i
+    return np.array(order, dtype=np.intp)
+
+
+def bucket_argsort(keys, num_buckets=NUM_BUCKETS):
+    # Stable permutation that sorts integer keys, so records can be reordered with a single gather
+    keys = [int(key) for key in keys]
+    if not keys:
+        return np.array([], dtype=np.intp)
+    order = _bucket_argsort(keys, range(len(keys)), split_threshold(len(keys), num_buckets), num_buckets, 0)
+    return np.array(order, dtype=np.intp)
+
+
+def _bucket_argsort(keys, indices, threshold, num_buckets, depth):
+    if len(indices) <= threshold or depth > MAX_SPLIT_DEPTH:
+        return sorted(indices, key=keys.__getitem__)  # sorted() is stable
+    min_value = min(keys[i] for i in indices)
+    max_value = max(keys[i] for i in indices)
+    if min_value == max_value:
+        return list(indices)
+
+    buckets = [[] for _ in range(num_buckets)]
+    for i in indices:
+        buckets[bucket_index(keys[i], min_value, max_value, num_buckets)].append(i)
+
+    order = []
+    for bucket in buckets:
+        order.extend(_bucket_argsort(keys, bucket, threshold, num_buckets, depth + 1))
+    return order
+
+
+# NumPy backend: whole-array operations, no per-element Python
+
+def _shifted(keys):
+    # Keys minus their minimum, in the narrowest unsigned type that holds the range; NumPy's stable sort
+    # is a radix (counting) sort for 8- and 16-bit integers. Widened to uint64 one chunk at a time only:
+    # wrapping uint64 subtraction is exact for any span of 64-bit keys, where int64 would overflow.
+    low, high = value_range(keys)
+    shifted = np.empty(len(keys), dtype=np.min_scalar_type(high - low))
+    offset = np.uint64(low % 2 ** 64)
+    for start in range(0, len(keys), CHUNK_SIZE):
+        shifted[start:start + CHUNK_SIZE] = keys[start:start + CHUNK_SIZE].astype(np.uint64) - offset
+    return shifted
+
+
+def numpy_merge_argsort(keys):
+    return np.argsort(np.asarray(keys), kind="stable")  # Timsort: merges of natural runs
+
+
+def numpy_counting_argsort(keys):
+    if len(keys) == 0:
+        return np.array([], dtype=np.intp)
+    return np.argsort(_shifted(np.asarray(keys)), kind="stable")
+
+
+def numpy_bucket_argsort(keys, num_buckets=NUM_BUCKETS):
+    keys = np.asarray(keys)
+    if len(keys) == 0:
+        return np.array([], dtype=np.intp)
+    shifted = _shifted(keys)
+    ids = (shifted // (int(shifted.max()) // num_buckets + 1)).astype(np.uint8)
+
+    # Scatter by bucket, then sort each bucket's slice on its own
+    order = np.argsort(ids, kind="stable")
+    ends = np.cumsum(np.bincount(ids, minlength=num_buckets))
+    start = 0
+    for end in ends:
+        segment = order[start:end]
+        order[start:end] = segment[np.argsort(keys[segment], kind="stable")]
+        start = end
+    return order
+
+
+# Numba backend: the reference loops, compiled; only built when Numba is installed
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _numba_merge_range(values, order, scratch_values, scratch_order, lo, hi):
+        # Stable sort of order[lo:hi] by values[lo:hi], where values holds each index's key alongside it.
+        # Runs of MERGE_RUN are insertion-sorted first, then merged bottom-up.
+        for run in range(lo, hi, MERGE_RUN):
+            for i in range(run + 1, min(run + MERGE_RUN, hi)):
+                value, index = values[i], order[i]
+                j = i - 1
+                while j >= run and values[j] > value:
+                    values[j + 1], order[j + 1] = values[j], order[j]
+                    j -= 1
+                values[j + 1], order[j + 1] = value, index
+
+        width = MERGE_RUN
+        while width < hi - lo:
+            for left in range(lo, hi, 2 * width):
+                middle = min(left + width, hi)
+                right = min(left + 2 * width, hi)
+                i, j, k = left, middle, left
+                while i < middle and j < right:
+                    if values[i] <= values[j]:
+                        scratch_values[k], scratch_order[k] = values[i], order[i]
+                        i += 1
+                    else:
+                        scratch_values[k], scratch_order[k] = values[j], order[j]
+                        j += 1
+                    k += 1
+                scratch_values[k:k + middle - i] = values[i:middle]
+                scratch_order[k:k + middle - i] = order[i:middle]
+                k += middle - i
+                scratch_values[k:right] = values[j:right]
+                scratch_order[k:right] = order[j:right]
+            values[lo:hi] = scratch_values[lo:hi]
+            order[lo:hi] = scratch_order[lo:hi]
+            width *= 2
+
+    # Keys stay in their own (often 8- or 16-bit) dtype; order is preallocated by the caller
+    @numba.njit(cache=True)
+    def _numba_merge_argsort(keys, order):
+        values = keys.copy()
+        order[:] = np.arange(len(keys))
+        _numba_merge_range(values, order, np.empty_like(values), np.empty_like(order), 0, len(keys))
+
+    @numba.njit(cache=True)
+    def _numba_counting_argsort(keys, order):
+        # Offsets in wrapping uint64 as in the bucket kernel; argsort() has already bounded the span
+        min_val = np.uint64(keys.min())
+        count = np.zeros(np.int64(np.uint64(keys.max()) - min_val) + 1, dtype=np.int64)
+        for key in keys:
+            count[np.int64(np.uint64(key) - min_val)] += 1
+        for i in range(1, len(count)):
+            count[i] += count[i - 1]
+
+        for i in range(len(keys) - 1, -1, -1):
+            slot = np.int64(np.uint64(keys[i]) - min_val)
+            count[slot] -= 1
+            order[count[slot]] = i
+
+    @numba.njit(cache=True)
+    def _numba_bucket_argsort(keys, order, num_buckets):
+        # Offsets from the minimum are taken in wrapping uint64, which is exact for any span of 64-bit keys;
+        # in int64 a span of 2^63 or more overflowed and sent indices outside starts (njit has no bounds checks)
+        min_value = np.uint64(keys.min())
+        bucket_range = (np.uint64(keys.max()) - min_value) // np.uint64(num_buckets) + np.uint64(1)
+
+        # Stable scatter into buckets stored as offset ranges of one array
+        starts = np.zeros(num_buckets + 1, dtype=np.int64)
+        for key in keys:
+            starts[np.int64((np.uint64(key) - min_value) // bucket_range) + 1] += 1
+        for b in range(num_buckets):
+            starts[b + 1] += starts[b]
+        fill = starts[:-1].copy()
+        for i in range(len(keys)):
+            b = np.int64((np.uint64(keys[i]) - min_value) // bucket_range)
+            order[fill[b]] = i
+            fill[b] += 1
+
+        values = keys[order]
+        scratch_values = np.empty_like(values)
+        scratch_order = np.empty_like(order)
+        for b in range(num_buckets):
+            _numba_merge_range(values, order, scratch_values, scratch_order, starts[b], starts[b + 1])
+
+
+def _index_buffer(n):
+    # 32-bit indices halve the permutation's footprint for anything under 2^31 elements
+    return np.empty(n, dtype=np.int32 if n < 2 ** 31 else np.int64)
+
+
+def numba_merge_argsort(keys):
+    order = _index_buffer(len(keys))
+    _numba_merge_argsort(np.ascontiguousarray(keys), order)
+    return order
+
+
+def numba_counting_argsort(keys):
+    order = _index_buffer(len(keys))
+    if len(keys):
+        _numba_counting_argsort(np.ascontiguousarray(keys), order)
+    return order
+
+
+def numba_bucket_argsort(keys, num_buckets=NUM_BUCKETS):
+    order = _index_buffer(len(keys))
+    if len(keys):
+        _numba_bucket_argsort(np.ascontiguousarray(keys), order, num_buckets)
+    return order
+
+
+BACKENDS = {
+    "python": {"merge": merge_argsort, "counting": counting_argsort, "bucket": bucket_argsort},
+    "numpy": {"merge": numpy_merge_argsort, "counting": numpy_counting_argsort, "bucket": numpy_bucket_argsort},
+}
+if numba is not None:
+    BACKENDS["numba"] = {"merge": numba_merge_argsort, "counting": numba_counting_argsort,
+                         "bucket": numba_bucket_argsort}
+
+
+def verification_inputs(seed=0):
+    # Small inputs covering duplicates, negatives, skew, the edge sizes and float keys (merge sort only)
+    rng = np.random.default_rng(seed)
+    return [
+        np.array([], dtype=np.int64),
+        np.array([7]),
+        rng.integers(1, 100, 257),
+        rng.integers(-50, 50, 300),
+        rng.integers(0, 4, 200),
+        np.concatenate([rng.integers(0, 5, 400), rng.integers(0, 10 ** 6, 40)]),
+        np.arange(100)[::-1],
+        np.round(rng.normal(0, 10, 300), 1),
+        np.array([2 ** 63 - 1, -2 ** 63, 0, -1, 1, 2 ** 63 - 1, -2 ** 63 + 1]),  # Span overflows int64
+    ]
+
+
+def verify_backend(name):
+    # Every kernel of the backend must return exactly the reference permutation (all of them are stable)
+    if name not in _verified:
+        reference = BACKENDS["python"]
+        _verified[name] = all(np.array_equal(BACKENDS[name][algorithm](keys), reference[algorithm](keys))
+                              for keys in verification_inputs() for algorithm in ALGORITHMS
+                              if supports_keys(algorithm, keys)
+                              and (algorithm != "counting" or key_span(keys) <= COUNT_ARRAY_LIMIT))
+    return _verified[name]
+
+
+def select_backend(name=None, algorithm="merge", verify=True):
+    # Picks the first installed backend in AUTO_BACKENDS that agrees with the reference, or checks the one
+    # asked for; verify=False skips that check for a backend the caller (e.g. a parent process) already verified
+    if name is None or name == "auto":
+        return next(backend for backend in AUTO_BACKENDS[algorithm] if backend in BACKENDS and verify_backend(backend))
+    if name not in BACKENDS:
+        raise ValueError(f"Backend '{name}' is not available. Choose one of: {', '.join(BACKENDS)}.")
+    if verify and not verify_backend(name):
+        raise RuntimeError(f"Backend '{name}' does not match the reference kernels.")
+    return name
+
+
+def gather(values, order):
+    # values.take(order, axis=0) one chunk at a time, so a 32-bit order is never widened to a full intp copy
+    result = np.empty((len(order),) + values.shape[1:], dtype=values.dtype)
+    for start in range(0, len(order), CHUNK_SIZE):
+        result[start:start + CHUNK_SIZE] = values[order[start:start + CHUNK_SIZE]]
+    return result
+
+
+def argsort(keys, algorithm="merge", backend=None, verify=True):
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Invalid algorithm '{algorithm}'. Choose one of: {', '.join(ALGORITHMS)}.")
+    keys = np.asarray(keys)
+    if not supports_keys(algorithm, keys):
+        raise ValueError(f"{algorithm.capitalize()} sort needs integer keys, got {keys.dtype}. Use merge sort instead.")
+    name = select_backend(backend, algorithm, verify)
+    # The python and numba counting kernels allocate one slot per value in the range; numpy's radix sort does not
+    span = key_span(keys) if algorithm == "counting" and name != "numpy" else 0
+    if span > COUNT_ARRAY_LIMIT:
+        raise ValueError(f"Value range {span} is too wide for counting sort with the {name} kernels "
+                         f"(limit {COUNT_ARRAY_LIMIT}). The numpy kernels sort it without a count array.")
+    return BACKENDS[name][algorithm](keys)
@@ -0,0 +1,9 @@
+import matplotlib
+
+
+def release_keys(*keys):
+    # Matplotlib's toolbar reads its shortcuts from rcParams on every key press, so a key the visualizers
+    # handle themselves must be removed there or it also switches a toolbar mode (zoom, fullscreen, ...)
+    for name, bound in matplotlib.rcParams.items():
+        if name.startswith("keymap.") and any(key in bound for key in keys):
+            matplotlib.rcParams[name] = [key for key in bound if key not in keys]
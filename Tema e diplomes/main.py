@@ -1,8 +1,11 @@
 import tkinter as tk
+from tkinter import messagebox
 from PIL import Image, ImageTk
 from merge_sort_draft import MergeSortVisualizer
 from counting_sort_draft import CountingSortVisualizer
 from bucket_sort_draft import BucketSortVisualizer
+from workload import MAX_WORKLOAD_SIZE
+from session import VisualizerSession
 import os
 
 
@@ -66,20 +69,22 @@ class SortingVisualizerApp:
 
         root.bind('<Configure>', self.on_resize)
 
+        # Each visualizer runs in its own process so the menu stays live and several sorts can run at once
+        self.sessions = []
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.poll_sessions()
+
     def on_resize(self, event):
         # Center the container when the window is resized
         self.container.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
 
     def run_merge_sort(self):
-        self.hide_main_window()
         self.choose_array_type(MergeSortVisualizer)
 
     def run_counting_sort(self):
-        self.hide_main_window()
         self.choose_array_type(CountingSortVisualizer)
 
     def run_bucket_sort(self):
-        self.hide_main_window()
         self.choose_array_type(BucketSortVisualizer)
 
     def choose_array_type(self, visualizer_class):
@@ -126,22 +131,65 @@ class SortingVisualizerApp:
                                      command=lambda: self.start_visualizer(visualizer_class, "custom"), **button_style)
         btn_custom_array.pack(pady=10)
 
+        # Generated workload: distribution, size and seed
+        workload_frame = tk.Frame(container, bg="#e0f7fa")
+        workload_frame.pack(pady=(20, 0))
+
+        # Only the kinds this algorithm can handle (counting sort cannot take an unbounded value range)
+        workload_kinds = visualizer_class.workload_kinds
+        self.workload_kind = tk.StringVar(value=workload_kinds[0])
+        kind_menu = tk.OptionMenu(workload_frame, self.workload_kind, *workload_kinds)
+        kind_menu.config(font=("Helvetica", 12), bg="#e0f7fa", fg="#00796b", highlightthickness=0)
+        kind_menu.grid(row=0, column=0, columnspan=4, pady=(0, 10))
+
+        tk.Label(workload_frame, text="Size:", font=("Helvetica", 12), bg="#e0f7fa", fg="#00796b").grid(row=1, column=0)
+        self.workload_size_entry = tk.Entry(workload_frame, font=("Helvetica", 12), justify='center', width=10)
+        self.workload_size_entry.insert(0, "10")
+        self.workload_size_entry.grid(row=1, column=1, padx=(5, 15))
+
+        tk.Label(workload_frame, text="Seed:", font=("Helvetica", 12), bg="#e0f7fa", fg="#00796b").grid(row=1, column=2)
+        self.workload_seed_entry = tk.Entry(workload_frame, font=("Helvetica", 12), justify='center', width=10)
+        self.workload_seed_entry.insert(0, "0")
+        self.workload_seed_entry.grid(row=1, column=3, padx=(5, 0))
+
+        btn_workload_array = tk.Button(container, text="Generated Workload",
+                                       command=lambda: self.start_workload_visualizer(visualizer_class),
+                                       **button_style)
+        btn_workload_array.pack(pady=10)
+
         # Bind the resize event to maintain centering
         self.array_type_window.bind('<Configure>', lambda event: self.on_resize_array_type_window(container))
 
     def on_resize_array_type_window(self, container):
         container.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
 
-    def start_visualizer(self, visualizer_class, array_type):
+    def start_visualizer(self, visualizer_class, array_type, workload=None):
         self.array_type_window.destroy()
-        visualizer_class(array_type=array_type, on_back_callback=self.show_main_window)
-
-    def hide_main_window(self):
-        self.root.withdraw()
-
-    def show_main_window(self):
-        self.root.deiconify()
-        self.root.state('zoomed')  # Maximize the window again
+        self.sessions.append(VisualizerSession(visualizer_class, array_type, workload))
+
+    def start_workload_visualizer(self, visualizer_class):
+        try:
+            size = int(self.workload_size_entry.get())
+            seed_text = self.workload_seed_entry.get().strip()
+            seed = int(seed_text) if seed_text else None
+        except ValueError:
+            messagebox.showerror("Invalid Workload", "Size and seed must be whole numbers.")
+            return
+        if not 1 <= size <= MAX_WORKLOAD_SIZE:
+            messagebox.showerror("Invalid Workload", f"Size must be between 1 and {MAX_WORKLOAD_SIZE}.")
+            return
+
+        workload = {"kind": self.workload_kind.get(), "size": size, "seed": seed}
+        self.start_visualizer(visualizer_class, "workload", workload=workload)
+
+    def poll_sessions(self):
+        self.sessions = [session for session in self.sessions if session.poll()]
+        self.root.after(200, self.poll_sessions)
+
+    def on_close(self):
+        for session in self.sessions:
+            session.close()
+        self.root.destroy()
 
     def show_help(self):
         help_window = tk.Toplevel(self.root)
@@ -161,10 +209,19 @@ class SortingVisualizerApp:
             "2. Choose the type of array to visualize: Random Array or Custom Array.\n"
             "   - Random Array: Generates a random array for visualization.\n"
             "   - Custom Array: Allows you to input a custom array for visualization.\n"
+            "   - Generated Workload: Generates a sorted, reversed, nearly sorted, few-unique, Zipf, Gaussian or\n"
+            "     wide-range array of the chosen size. The same seed always gives the same array.\n"
+            "     Counting sort does not offer wide-range arrays: its count array grows with the value range.\n"
             "3. Follow the on-screen instructions to see the visualization of the chosen sorting algorithm.\n"
             "4. To change the speed of the visualizer use 1 - Fast, 2 - Medium and    3 - Slow.\n"
             "5. To pause the visualizer press 'p' on your keyboard, and to resume press 'r'.\n"
-            "6. You can go back to the main menu at any time by using the provided 'Back' button."
+            "   Press 'o' to show a render profiler (time per stage, FPS, artists per frame) and record it to a CSV\n"
+            "   under ~/.cache/sorting_visualizer/profiles.\n"
+            "   Long arrays are shown through a window with a minimap below: the left/right arrows pan, '+'/'-' zoom,\n"
+            "   'f' toggles following the algorithm, and clicking the minimap jumps there. In the visualizer windows\n"
+            "   these keys replace Matplotlib's shortcuts: fullscreen stays on Ctrl+F, back/forward on the toolbar.\n"
+            "6. The main menu stays open while a visualization runs, so several sorts can run side by side.\n"
+            "   The 'Back' button closes a visualization."
         )
 
         label = tk.Label(help_window, text=help_text, font=("Helvetica", 14), bg="#e0f7fa", fg="#00796b",
@@ -1,26 +1,257 @@
+import json
+import os
+import platform
+import threading
+import time
 import tkinter as tk
+from bisect import bisect_left, bisect_right
+from functools import partial
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.widgets import Button
+from workload import WORKLOAD_KINDS, generate_workload
+from trace_cache import trace_cache, trace_key
+from step_worker import StepWorker
+from profiler import PROFILER_KEY, RenderProfiler
+from viewport import Viewport
+from ingest import ArrayBuffer
+
+MERGE_VARIANTS = ["standard", "inplace", "hybrid"]
+INPLACE_BUFFER_SIZE = 16  # Elements of scratch space the in-place variant may use
+CUTOFF_CANDIDATES = [1, 4, 8, 12, 16, 24, 32, 48, 64]
+CUTOFF_REPEATS = 9
+CUTOFF_TOLERANCE = 0.05  # Cutoffs within 5% of the fastest are treated as ties, and the smallest one wins
+CUTOFF_PATH = os.path.join(os.path.expanduser("~"), ".cache", "sorting_visualizer", "merge_cutoff.json")
+
+
+def merge_sort_steps(arr, variant="standard", cutoff=None):
+    # Sorts a private copy and yields ("select", l, r) / ("merged", l, r, values, aux_bytes) /
+    # ("insertion", l, r, values) steps for the visualizer to replay
+    arr = np.array(arr)
+    if variant == "inplace":
+        merge = partial(_inplace_merge_steps, buffer=np.empty(min(INPLACE_BUFFER_SIZE, len(arr)), dtype=arr.dtype))
+    elif variant in ("standard", "hybrid"):
+        merge = _merge_steps
+    else:
+        raise ValueError(f"Invalid merge variant '{variant}'. Choose one of: {', '.join(MERGE_VARIANTS)}.")
+
+    if variant != "hybrid":
+        cutoff = 1  # Recurse down to single elements
+    elif cutoff is None:
+        cutoff = insertion_cutoff()
+    yield from _merge_sort_steps(arr, 0, len(arr) - 1, merge, cutoff)
+
+
+def _merge_sort_steps(arr, l, r, merge, cutoff):
+    if l < r and r - l + 1 <= cutoff:
+        _insertion_sort(arr, l, r)
+        yield "insertion", l, r, arr[l:r + 1].copy()
+    elif l < r:
+        m = (l + r) // 2
+
+        yield from _merge_sort_steps(arr, l, m, merge, cutoff)
+        yield from _merge_sort_steps(arr, m + 1, r, merge, cutoff)
+        yield from merge(arr, l, m, r)
+
+
+def _insertion_sort(arr, l, r):
+    for i in range(l + 1, r + 1):
+        key = arr[i]
+        j = i - 1
+        while j >= l and arr[j] > key:
+            arr[j + 1] = arr[j]
+            j -= 1
+        arr[j + 1] = key
+
+
+def calibrate_cutoff(size=2048, repeats=CUTOFF_REPEATS, seed=0):
+    # Times the hybrid sort for each candidate cutoff on this machine. One untimed warm-up pass, then the
+    # candidates are interleaved (in a rotating order) so a burst of load, such as the GUI thread holding the
+    # GIL, hits them all rather than skewing one
+    arr = np.random.default_rng(seed).integers(0, 10 ** 6, size)
+
+    def run(cutoff):
+        start = time.perf_counter()
+        for _ in merge_sort_steps(arr, "hybrid", cutoff):
+            pass
+        return time.perf_counter() - start
+
+    for cutoff in CUTOFF_CANDIDATES:
+        run(cutoff)
+    timings = dict.fromkeys(CUTOFF_CANDIDATES, float("inf"))
+    for repeat in range(repeats):
+        shift = repeat % len(CUTOFF_CANDIDATES)
+        for cutoff in CUTOFF_CANDIDATES[shift:] + CUTOFF_CANDIDATES[:shift]:
+            timings[cutoff] = min(timings[cutoff], run(cutoff))
+
+    # Noise alone moves the raw minimum between neighbours, so take the smallest cutoff that is close enough
+    fastest = min(timings.values())
+    return min(cutoff for cutoff in CUTOFF_CANDIDATES if timings[cutoff] <= fastest * (1 + CUTOFF_TOLERANCE))
+
+
+def insertion_cutoff():
+    # Calibrated once per machine and Python version, then reused by later sessions
+    # '-v2': cutoffs stored by the earlier, noisier calibration are measured again
+    machine = f"{platform.node()}-{platform.machine()}-py{platform.python_version()}-v2"
+    try:
+        with open(CUTOFF_PATH) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+    if machine not in stored:
+        stored[machine] = calibrate_cutoff()
+        os.makedirs(os.path.dirname(CUTOFF_PATH), exist_ok=True)
+        tmp_path = f"{CUTOFF_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(stored, f, indent=2)
+        os.replace(tmp_path, CUTOFF_PATH)  # Atomic, so parallel sessions never read a half-written file
+    return stored[machine]
+
+
+def _merge_steps(arr, l, m, r):
+    L = arr[l:m + 1].copy()
+    R = arr[m + 1:r + 1].copy()
+
+    i = j = 0
+    k = l
+
+    yield "select", l, m
+    yield "select", m + 1, r
+
+    while i < len(L) and j < len(R):
+        if L[i] <= R[j]:
+            arr[k] = L[i]
+            i += 1
+        else:
+            arr[k] = R[j]
+            j += 1
+        k += 1
+
+    while i < len(L):
+        arr[k] = L[i]
+        i += 1
+        k += 1
+
+    while j < len(R):
+        arr[k] = R[j]
+        j += 1
+        k += 1
+
+    yield "merged", l, r, arr[l:r + 1].copy(), L.nbytes + R.nbytes
+
+
+def _inplace_merge_steps(arr, l, m, r, buffer):
+    yield "select", l, m
+    yield "select", m + 1, r
+
+    used = _inplace_merge(arr, l, m + 1, r + 1, buffer)
+
+    yield "merged", l, r, arr[l:r + 1].copy(), used * arr.itemsize
+
+
+def _inplace_merge(arr, first, middle, last, buffer):
+    # Stable merge of arr[first:middle] and arr[middle:last] using at most len(buffer) extra elements.
+    # Runs that fit in the buffer are merged through it; larger ones are split with binary searches and
+    # a rotation, then merged recursively. Returns how many buffer elements were in use at the peak.
+    len1 = middle - first
+    len2 = last - middle
+    if len1 == 0 or len2 == 0:
+        return 0
+
+    if len1 <= len(buffer):
+        buffer[:len1] = arr[first:middle]
+        i, j, k = 0, middle, first
+        while i < len1 and j < last:
+            if buffer[i] <= arr[j]:
+                arr[k] = buffer[i]
+                i += 1
+            else:
+                arr[k] = arr[j]
+                j += 1
+            k += 1
+        arr[k:k + len1 - i] = buffer[i:len1]
+        return len1
+
+    if len2 <= len(buffer):
+        buffer[:len2] = arr[middle:last]
+        i, j, k = middle - 1, len2 - 1, last - 1
+        while i >= first and j >= 0:
+            if buffer[j] < arr[i]:
+                arr[k] = arr[i]
+                i -= 1
+            else:
+                arr[k] = buffer[j]
+                j -= 1
+            k -= 1
+        arr[first:first + j + 1] = buffer[:j + 1]
+        return len2
+
+    if len1 > len2:
+        cut1 = first + len1 // 2
+        cut2 = bisect_left(arr, arr[cut1], middle, last)
+    else:
+        cut2 = middle + len2 // 2
+        cut1 = bisect_right(arr, arr[cut2], first, middle)
+    new_middle = _rotate(arr, cut1, middle, cut2)
+
+    used_left = _inplace_merge(arr, first, cut1, new_middle, buffer)
+    used_right = _inplace_merge(arr, new_middle, cut2, last, buffer)
+    return max(used_left, used_right)
+
+
+def _rotate(arr, first, middle, last):
+    # Swaps arr[first:middle] and arr[middle:last] with three reversals, without extra storage
+    _reverse(arr, first, middle - 1)
+    _reverse(arr, middle, last - 1)
+    _reverse(arr, first, last - 1)
+    return first + (last - middle)
+
+
+def _reverse(arr, i, j):
+    while i < j:
+        arr[i], arr[j] = arr[j], arr[i]
+        i += 1
+        j -= 1
+
 
 class MergeSortVisualizer:
-    def __init__(self, array_type="random", on_back_callback=None):
+    workload_defaults = {}
+    workload_kinds = WORKLOAD_KINDS
+
+    def __init__(self, array_type="random", on_back_callback=None, workload=None, array=None, variant="standard"):
         self.on_back_callback = on_back_callback
+        self.variant = variant
         self.paused = False
         self.fig, self.ax = plt.subplots()
         self.fig.canvas.manager.window.state('zoomed')  # Maximize window
         self.text = self.fig.text(0.02, 0.02, "", fontsize=10, color="black")
         self.interval = 1.0  # Default execution speed
+        self.worker = None
+        self.timer = None
+        self.profiler = RenderProfiler("merge")
 
         if array_type == "random":
             self.original_array = np.random.randint(1, 100, np.random.randint(5, 10))
             self.arr = self.original_array.copy()
             self.init_visualization()
+        elif array_type == "workload":
+            self.original_array = generate_workload(**{**self.workload_defaults, **(workload or {})})
+            self.arr = self.original_array.copy()
+            self.init_visualization()
+        elif array_type == "array":
+            self.original_array = np.asarray(array)
+            self.arr = self.original_array.copy()
+            self.init_visualization()
         elif array_type == "custom":
             self.arr = []
             self.get_custom_array()
 
     def init_visualization(self):
+        self.profiler.attach(self.fig)
+        self.viewport = Viewport(self.fig, self.arr, on_change=self.redraw)
+        self.y_max = int(np.max(self.arr))  # Merging only reorders values, so the y-axis never changes
+        self.y_min = min(0, int(np.min(self.arr)))  # Negative values get bars below the axis
+        self.frame = (None, None, False, False, False)
         self.ax.clear()  # Clear previous plot elements
         self.ax.set_title('Initial Array')
         self.plot_bars()
@@ -44,18 +275,35 @@ class MergeSortVisualizer:
         self.back_button = Button(back_button_ax, 'Back to Main Menu', color='#4CAF50', hovercolor='lightgreen')
         self.back_button.on_clicked(self.on_back_clicked)
 
+        # Add merge variant toggle (restarts with the other variant)
+        variant_button_ax = self.fig.add_axes([0.28, 0.001, 0.1, 0.06])
+        self.variant_button = Button(variant_button_ax, f'Variant: {self.variant}', color='#4CAF50',
+                                     hovercolor='lightgreen')
+        self.variant_button.on_clicked(self.on_variant_clicked)
+
+        # Auxiliary memory meter, compared against the standard variant's O(n) peak
+        self.aux_bytes = 0
+        self.peak_aux_bytes = 0
+        self.memory_text = self.fig.text(0.98, 0.02, "", ha='right', fontsize=10, color="dimgray")
+        self.update_memory_meter()
+
         self.run_algorithm()
 
     def plot_bars(self):
-        self.ax.clear()
-        self.bars = self.ax.bar(range(len(self.arr)), self.arr, color='skyblue', align='center')  # Changed color to skyblue
-        for bar in self.bars:
-            height = bar.get_height()
-            self.ax.text(bar.get_x() + bar.get_width() / 2., height + 1, '%d' % int(height), ha='center', va='bottom',
-                         fontsize=8, color='black')
-        plt.xticks(range(len(self.arr)), [str(x) for x in self.arr])
-        plt.ylim(0, max(self.arr) + 10)  # Adjust y-axis limit dynamically
-        plt.pause(self.interval)
+        with self.profiler.stage("clear"):
+            self.ax.clear()
+        with self.profiler.stage("bars"):
+            # Only the viewport's window is drawn, so a frame costs the same for 10 or 10^6 elements
+            start, end = self.viewport.start, self.viewport.end
+            window = self.viewport.window(self.arr)
+            self.bars = self.ax.bar(range(start, end), window, color='skyblue', align='center')  # Changed color to skyblue
+            if self.viewport.show_labels:
+                for bar in self.bars:
+                    height = bar.get_height()
+                    self.ax.text(bar.get_x() + bar.get_width() / 2., height + 1, '%d' % int(height), ha='center',
+                                 va='bottom', fontsize=8, color='black')
+                self.ax.set_xticks(range(start, end), [str(x) for x in window])
+            self.ax.set_ylim(self.y_min, self.y_max + 10)
 
     def on_key_press(self, event):
         if event.key == '1':
@@ -76,80 +324,65 @@ class MergeSortVisualizer:
         elif event.key == 'r':
             self.paused = False
             self.update_speed_message("Resumed. Current speed: Medium")
+        elif event.key == PROFILER_KEY:
+            self.profiler.toggle()
+        elif self.viewport.on_key(event.key):  # Arrows pan, +/- zoom, 'f' follows the merge
+            self.redraw()
+
+        if self.timer is not None:
+            self.timer.interval = int(self.interval * 1000)
 
     def update_speed_message(self, message):
         self.speed_instructions.set_text(message)
 
-    def merge(self, l, m, r):
-        L = self.arr[l:m + 1].copy()
-        R = self.arr[m + 1:r + 1].copy()
-
-        i = j = 0
-        k = l
-
-        # Visualize L and R in yellow before merging
-        self.visualize(l, m, show_yellow=True)
-        self.visualize(m + 1, r, show_yellow=True)
-
-        while i < len(L) and j < len(R):
-            if L[i] <= R[j]:
-                self.arr[k] = L[i]
-                i += 1
-            else:
-                self.arr[k] = R[j]
-                j += 1
-            k += 1
-
-            # Check for pause and resume
-            if self.paused:
-                while self.paused:
-                    plt.pause(0.1)
-
-        while i < len(L):
-            self.arr[k] = L[i]
-            i += 1
-            k += 1
-
-            # Check for pause and resume
-            if self.paused:
-                while self.paused:
-                    plt.pause(0.1)
-
-        while j < len(R):
-            self.arr[k] = R[j]
-            j += 1
-            k += 1
-
-            # Check for pause and resume
-            if self.paused:
-                while self.paused:
-                    plt.pause(0.1)
-
-        # Visualize the merged section in green
-        self.visualize(l, r, merged=True)
-
-    def merge_sort(self, l, r):
-        if l < r:
-            m = (l + r) // 2
-
-            self.merge_sort(l, m)
-            self.merge_sort(m + 1, r)
-            self.merge(l, m, r)
-
-    def visualize(self, l=None, r=None, merged=False, show_yellow=False):
+    def apply_step(self, step):
+        # Replay one step of the trace onto self.arr and draw it
+        if step[0] == "select":
+            _, l, r = step
+            self.viewport.show(l, r)
+            self.visualize(l, r, show_yellow=True)  # Visualize L and R in yellow before merging
+        elif step[0] == "merged":
+            _, l, r, values, aux_bytes = step
+            self.arr[l:r + 1] = values
+            # The meter rides along with the merge it measures instead of taking a tick of its own
+            self.aux_bytes = aux_bytes
+            self.peak_aux_bytes = max(self.peak_aux_bytes, aux_bytes)
+            self.update_memory_meter()
+            self.viewport.update_minimap(self.arr, l, r)
+            self.viewport.show(l, r)
+            self.visualize(l, r, merged=True)  # Visualize the merged section in green
+        elif step[0] == "insertion":
+            _, l, r, values = step
+            self.arr[l:r + 1] = values
+            self.viewport.update_minimap(self.arr, l, r)
+            self.viewport.show(l, r)
+            self.visualize(l, r, insertion=True)  # Visualize the insertion-sorted leaf in orchid
+
+    def update_memory_meter(self):
+        standard_peak = len(self.arr) * np.asarray(self.arr).itemsize  # The top-level merge copies every element
+        self.memory_text.set_text(f'Aux memory ({self.variant}): {self.aux_bytes} B in use, '
+                                  f'peak {self.peak_aux_bytes} B | standard peak: {standard_peak} B')
+
+    def visualize(self, l=None, r=None, merged=False, show_yellow=False, insertion=False):
+        self.frame = (l, r, merged, show_yellow, insertion)
         self.plot_bars()
 
-        colors = ['skyblue'] * len(self.arr)  # Adjusted to use skyblue color
+        start = self.viewport.start
+        colors = ['skyblue'] * len(self.bars)  # Adjusted to use skyblue color
         if l is not None and r is not None:
+            visible = range(max(l, start), min(r + 1, self.viewport.end))  # Part of [l, r] inside the viewport
             if merged:
-                for i in range(l, r + 1):
-                    colors[i] = 'lightgreen'  # Highlighting the merged range in lightgreen
+                for i in visible:
+                    colors[i - start] = 'lightgreen'  # Highlighting the merged range in lightgreen
             elif show_yellow:
-                for i in range(l, r + 1):
-                    colors[i] = 'gold'  # Highlighting the range in gold before merging
+                for i in visible:
+                    colors[i - start] = 'gold'  # Highlighting the range in gold before merging
+            elif insertion:
+                for i in visible:
+                    colors[i - start] = 'orchid'  # Highlighting a leaf sorted by insertion sort
             else:
-                for i in range(l, r + 1):
-                    colors[i] = 'skyblue'  # Default color if not merged or showing yellow
+                for i in visible:
+                    colors[i - start] = 'skyblue'  # Default color if not merged or showing yellow
 
         for bar, color in zip(self.bars, colors):
             bar.set_color(color)
@@ -159,36 +392,102 @@ class MergeSortVisualizer:
         self.speed_instructions.set_text('')  # Clear speed selection instructions
         if l is not None and r is not None:
             if merged:
-                self.ax.set_title(f'Merged subarrays: {self.arr[l:r + 1]}')
+                self.ax.set_title(f'Merged subarrays: {self.viewport.range_text(self.arr, l, r)}')
+            elif insertion:
+                self.ax.set_title(f'Insertion-sorted leaf: {self.viewport.range_text(self.arr, l, r)}')
             else:
-                self.ax.set_title(f'Merging subarrays: {self.arr[l:r + 1]}')
+                self.ax.set_title(f'Merging subarrays: {self.viewport.range_text(self.arr, l, r)}')
         else:
             self.ax.set_title('Initial Array')
-        self.text.set_text(f'Current Array: {self.arr}')
-        self.fig.canvas.draw()
-        plt.pause(self.interval)
+        self.text.set_text(self.viewport.status(self.viewport.window(self.arr)))
+        self.profiler.draw()
+
+    def redraw(self):
+        # Re-render the current frame after the viewport was panned or zoomed
+        if self.frame is None:
+            self.visualize(0, len(self.arr) - 1, merged=True)  # The final merge leaves everything green
+            self.show_sorted()
+        else:
+            self.visualize(*self.frame)
+
+    def show_sorted(self):
+        self.frame = None
+        self.ax.set_title('Sorted Array')
+        self.text.set_text(self.viewport.status(self.viewport.window(self.arr), 'Sorted Array'))
+        self.fig.canvas.draw_idle()
 
     def run_algorithm(self):
         plt.waitforbuttonpress()
-        self.merge_sort(0, len(self.arr) - 1)
-
-        self.ax.set_title('Sorted Array')
-        self.text.set_text(f'Sorted Array: {self.arr}')
-        self.fig.canvas.draw()
+        arr = np.array(self.arr)
+        variant = self.variant
+
+        def make_steps():
+            # Runs on the worker thread, so the first hybrid run's calibration never blocks the window
+            cutoff = insertion_cutoff() if variant == "hybrid" else None
+            # The cutoff changes the trace; '-aux' marks traces whose merged steps carry the aux bytes
+            key = trace_key("merge", f"{variant}{cutoff or ''}-aux", arr)
+            return trace_cache.steps(key, lambda: merge_sort_steps(arr, variant, cutoff))
+
+        # The sort runs on a worker thread; a timer on the figure draws one step per tick
+        self.worker = StepWorker(make_steps)
+        self.worker.start()
+        self.timer = self.fig.canvas.new_timer(interval=int(self.interval * 1000))
+        self.timer.add_callback(self.on_timer)
+        self.timer.start()
 
         plt.show()
 
+    def on_timer(self):
+        if self.paused or self.worker is None:
+            return
+        try:
+            step = self.worker.poll()
+        except Exception as error:  # Raised by the sort on the worker thread
+            self.show_error(error)
+            return
+        if step is not None:
+            self.profiler.begin_frame(self.worker)
+            self.apply_step(step)
+            self.profiler.end_frame()
+        elif self.worker.finished:
+            self.timer.stop()
+            self.show_sorted()
+
+    def show_error(self, error):
+        # An exception escaping the timer callback would kill the timer and freeze the figure silently
+        self.stop_algorithm()
+        self.ax.set_title(f'Sorting failed: {error}', color='red')
+        self.update_speed_message(f"Sorting failed ({type(error).__name__}). Press Restart to try again.")
+        self.fig.canvas.draw_idle()
+
+    def stop_algorithm(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+
     def on_back_clicked(self, event):
+        self.stop_algorithm()
+        self.profiler.close()
         plt.close(self.fig)
         if self.on_back_callback:
             self.on_back_callback()
 
     def on_restart_clicked(self, event):
+        self.stop_algorithm()
         plt.close(self.fig)
+        self.arr = self.original_array.copy()
         self.fig, self.ax = plt.subplots()
         self.fig.canvas.manager.window.state('zoomed')  # Maximize window
+        self.text = self.fig.text(0.02, 0.02, "", fontsize=10, color="black")
         self.init_visualization()  # Restart the visualization with the same array
 
+    def on_variant_clicked(self, event):
+        self.variant = MERGE_VARIANTS[(MERGE_VARIANTS.index(self.variant) + 1) % len(MERGE_VARIANTS)]
+        self.on_restart_clicked(event)
+
     def get_custom_array(self):
         self.root = tk.Tk()
         self.root.title("Enter Custom Array")
@@ -211,9 +510,8 @@ class MergeSortVisualizer:
         self.root.mainloop()
 
     def submit_length(self):
-        array_length = int(self.array_length_entry.get())
-        self.original_array = np.random.randint(1, 100, array_length)
-        self.arr = self.original_array.copy()
+        self.array_length = int(self.array_length_entry.get())
+        self.buffer = ArrayBuffer(self.array_length)  # Typed, preallocated; widened only if a value needs it
 
         self.root.destroy()
         self.root = tk.Tk()
@@ -242,15 +540,16 @@ class MergeSortVisualizer:
     def submit_element(self):
         element_value = self.entry.get().strip()
         if element_value.isdigit():
-            self.original_array[self.current_index] = int(element_value)
-            self.arr[self.current_index] = int(element_value)
+            self.buffer.append(int(element_value))
             self.current_index += 1
 
-        if self.current_index < len(self.arr):
+        if self.current_index < self.array_length:
             self.label.config(text=f"Enter element {self.current_index + 1}:")
             self.entry.delete(0, tk.END)  # Clear the entry for the next element
         else:
             self.root.destroy()
+            self.original_array = self.buffer.array()
+            self.arr = self.original_array.copy()
             self.init_visualization()
 
     def center_window(self, window, width, height):
@@ -0,0 +1,111 @@
+import csv
+import os
+import time
+from contextlib import contextmanager
+from keymap import release_keys
+
+STAGES = ["algorithm", "clear", "bars", "draw", "wait"]
+PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "sorting_visualizer", "profiles")
+PROFILER_KEY = 'o'  # Also Matplotlib's zoom-rectangle shortcut, which is unbound while a profiler exists
+
+
+class RenderProfiler:
+    def __init__(self, name):
+        self.name = name
+        self.enabled = False
+        self.fig = None
+        self.text = None
+        self.csv_file = None
+        self.csv_writer = None
+        self.reset()
+        release_keys(PROFILER_KEY)
+
+    def reset(self):
+        self.frames = 0
+        self.frame = dict.fromkeys(STAGES, 0.0)
+        self.frame_start = None
+        self.last_frame_start = None
+        self.last_frame_end = None
+        self.last_busy_seconds = 0.0
+        self.artists_before = set()
+
+    def attach(self, fig):
+        # Called for every new figure (Restart may build a new one)
+        self.fig = fig
+        self.text = fig.text(0.98, 0.97, "", ha='right', va='top', fontsize=8, family='monospace', color='purple',
+                             visible=self.enabled)
+        self.reset()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if self.enabled:
+            # The pid keeps parallel sessions of the same algorithm from writing to the same file
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR,
+                                f"render_profile_{self.name}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.csv")
+            self.csv_file = open(path, "w", newline="")
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(["frame"] + [f"{stage}_ms" for stage in STAGES] + ["total_ms", "fps", "artists_created"])
+            self.text.set_text(f"Profiling to {path}")
+        else:
+            self.close()
+        self.reset()
+        self.text.set_visible(self.enabled)
+        self.fig.canvas.draw_idle()
+
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
+            self.csv_writer = None
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.frame[name] += time.perf_counter() - start
+
+    def draw(self):
+        # draw_idle defers the real work to the event loop, so measure a synchronous draw while profiling
+        if not self.enabled:
+            self.fig.canvas.draw_idle()
+            return
+        with self.stage("draw"):
+            self.fig.canvas.draw()
+
+    def begin_frame(self, worker):
+        if not self.enabled:
+            return
+        self.frame = dict.fromkeys(STAGES, 0.0)
+        self.frame_start = time.perf_counter()
+        if self.last_frame_end is not None:
+            self.frame["wait"] = self.frame_start - self.last_frame_end  # Time spent waiting for the timer tick
+
+        # Time the worker thread spent producing steps since the previous frame
+        self.frame["algorithm"] = worker.busy_seconds - self.last_busy_seconds
+        self.last_busy_seconds = worker.busy_seconds
+        self.artists_before = {id(artist) for artist in self.fig.findobj()}
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        end = time.perf_counter()
+        created = sum(1 for artist in self.fig.findobj() if id(artist) not in self.artists_before)
+        fps = 1.0 / (self.frame_start - self.last_frame_start) if self.last_frame_start is not None else 0.0
+        total = sum(self.frame.values())
+        self.frames += 1
+
+        stage_ms = [self.frame[stage] * 1000 for stage in STAGES]
+        self.csv_writer.writerow([self.frames] + [f"{ms:.3f}" for ms in stage_ms] + [f"{total * 1000:.3f}",
+                                                                                    f"{fps:.2f}", created])
+        self.text.set_text("\n".join(f"{stage:>9}: {ms:8.2f} ms" for stage, ms in zip(STAGES, stage_ms)) +
+                           f"\n{'total':>9}: {total * 1000:8.2f} ms\n{'fps':>9}: {fps:8.2f}"
+                           f"\n{'artists':>9}: {created:8d}")
+
+        self.last_frame_start = self.frame_start
+        self.last_frame_end = end
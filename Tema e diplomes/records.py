@@ -0,0 +1,29 @@
+import numpy as np
+from kernels import ALGORITHMS, argsort, gather
+
+
+def record_keys(records, key):
+    # A field of a structured array (by name or position), or a column of a 2-D array
+    names = records.dtype.names
+    if names is not None:
+        if isinstance(key, (int, np.integer)):
+            if not -len(names) <= key < len(names):
+                raise ValueError(f"Records have {len(names)} fields ({', '.join(names)}), no field {key}.")
+            key = names[key]  # records[1] would be the second record, not the second field
+        return records[key]
+    if records.ndim != 2:
+        raise ValueError(f"Records must be a structured or 2-D array, got shape {records.shape}.")
+    return records[:, key]
+
+
+def sort_records(records, key, algorithm="merge", backend=None, verify=True):
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Invalid algorithm '{algorithm}'. Choose one of: {', '.join(ALGORITHMS)}.")
+    records = np.asarray(records)
+
+    # Only the compact key column goes through the sort; the wide payload is moved once
+    keys = record_keys(records, key)
+    if keys.shape != (len(records),):
+        raise ValueError(f"The key must give one value per record, got shape {keys.shape} for {len(records)} records.")
+    order = argsort(keys, algorithm, backend, verify)
+    return gather(records, order)
@@ -0,0 +1,56 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import matplotlib.pyplot as plt
+import numpy as np
+from workload import generate_workload
+
+# Tk and X connections do not survive fork(), so every session starts from a fresh interpreter
+_context = multiprocessing.get_context("spawn")
+
+
+class VisualizerSession:
+    def __init__(self, visualizer_class, array_type, workload=None):
+        self.shm = None
+        self.loaded = _context.Event()
+        array_spec = None
+
+        if array_type == "workload":
+            # Generated here once and handed over through shared memory instead of being pickled
+            arr = generate_workload(**{**visualizer_class.workload_defaults, **(workload or {})})
+            self.shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=self.shm.buf)[:] = arr
+            array_spec = (self.shm.name, arr.shape, arr.dtype.str)
+            array_type = "array"
+        else:
+            self.loaded.set()  # Nothing to hand over
+
+        self.process = _context.Process(target=run_session, args=(visualizer_class, array_type, array_spec, self.loaded),
+                                        daemon=True)
+        self.process.start()
+
+    def poll(self):
+        # Releases the shared block once the child has its own copy; returns False when the session has ended
+        if self.shm is not None and (self.loaded.is_set() or not self.process.is_alive()):
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+        return self.process.is_alive()
+
+    def close(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.poll()
+
+
+def run_session(visualizer_class, array_type, array_spec, loaded):
+    array = None
+    if array_spec is not None:
+        name, shape, dtype = array_spec
+        shm = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+        shm.close()
+    loaded.set()
+
+    visualizer_class(array_type=array_type, array=array)
+    plt.show()  # Keep this process alive until its figure is closed
@@ -0,0 +1,62 @@
+import queue
+import threading
+import time
+
+QUEUE_SIZE = 256  # Steps the worker may run ahead of the display before it blocks
+_DONE = object()
+
+
+class StepWorker:
+    def __init__(self, make_steps, maxsize=QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize)
+        self.cancelled = threading.Event()
+        self.finished = False
+        self.error = None
+        self.busy_seconds = 0.0  # Time spent inside the step generator, read by the profiler
+        self.thread = threading.Thread(target=self.run, args=(make_steps,), daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self, make_steps):
+        steps = None
+        try:
+            steps = make_steps()  # Inside the try, so a failure while building the steps is reported too
+            while True:
+                start = time.perf_counter()
+                step = next(steps, _DONE)
+                self.busy_seconds += time.perf_counter() - start
+                if step is _DONE or not self.put(step):
+                    break
+        except Exception as error:  # Surfaced to the GUI thread through poll()
+            self.error = error
+        finally:
+            if hasattr(steps, "close"):
+                steps.close()
+        self.put(_DONE)
+
+    def put(self, item):
+        # Block while the queue is full (backpressure), but give up as soon as the worker is cancelled
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def poll(self):
+        # Called from the GUI thread: returns the next step, or None if none is ready yet
+        try:
+            item = self.queue.get_nowait()
+        except queue.Empty:
+            return None
+        if item is _DONE:
+            self.finished = True
+            if self.error is not None:
+                raise self.error
+            return None
+        return item
+
+    def cancel(self):
+        self.cancelled.set()
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import numpy as np
+
+TRACE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "sorting_visualizer", "traces")
+MEMORY_LIMIT_BYTES = 256 * 1024 * 1024  # Size cap for the in-memory tier (pickled size), least recently used first
+DISK_LIMIT_BYTES = 512 * 1024 * 1024  # Size cap for the on-disk tier
+
+
+def trace_key(algorithm, variant, arr):
+    arr = np.ascontiguousarray(arr)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{arr.dtype.str}{arr.shape}".encode())
+    digest.update(arr.tobytes())
+    return algorithm, variant, digest.hexdigest()
+
+
+class TraceCache:
+    def __init__(self, cache_dir=TRACE_CACHE_DIR, memory_limit_bytes=MEMORY_LIMIT_BYTES,
+                 disk_limit_bytes=DISK_LIMIT_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_limit_bytes = memory_limit_bytes
+        self.disk_limit_bytes = disk_limit_bytes
+        self.memory = OrderedDict()  # Key -> (trace, size in bytes)
+        self.memory_bytes = 0
+        self.recordings = {}  # Key -> Recording still being built, shared by every replay of that key
+        self.lock = threading.Lock()  # Traces are recorded on their own threads
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, "-".join(key) + ".pkl")
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key][0]
+
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            trace = pickle.loads(data)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for disk eviction
+        except OSError:
+            pass
+        self.remember(key, trace, len(data))
+        return trace
+
+    def put(self, key, trace):
+        data = pickle.dumps(trace, protocol=pickle.HIGHEST_PROTOCOL)
+        self.remember(key, trace, len(data))
+        if len(data) > self.disk_limit_bytes:
+            return  # Would evict everything else and still not fit
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict_disk()
+
+    def remember(self, key, trace, size):
+        # A merge trace holds O(n log n) values, so the tier is bounded by size rather than by entry count
+        if size > self.memory_limit_bytes:
+            return  # Would evict everything else and still not fit
+        with self.lock:
+            if key in self.memory:
+                self.memory_bytes -= self.memory.pop(key)[1]
+            self.memory[key] = (trace, size)
+            self.memory_bytes += size
+            while self.memory_bytes > self.memory_limit_bytes:
+                self.memory_bytes -= self.memory.popitem(last=False)[1][1]
+
+    def evict_disk(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pkl"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue  # Removed by another process
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.disk_limit_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
+
+    def steps(self, key, make_steps):
+        # Replay a cached trace, or one still being recorded. The recording runs on its own thread at full
+        # speed, so it is cached even if this replay is cancelled part-way (Restart, Back)
+        trace = self.get(key)
+        if trace is not None:
+            yield from trace
+            return
+
+        with self.lock:
+            recording = self.recordings.get(key)
+            if recording is None:
+                recording = self.recordings[key] = Recording()
+                threading.Thread(target=self.record, args=(key, recording, make_steps), daemon=True).start()
+        yield from recording.replay()
+
+    def record(self, key, recording, make_steps):
+        recording.run(make_steps)
+        try:
+            if recording.error is None:
+                self.put(key, recording.steps)
+        finally:
+            with self.lock:
+                del self.recordings[key]  # Only after put(), so a new replay always finds one or the other
+
+
+class Recording:
+    # A trace being built; replays read it while it grows
+    def __init__(self):
+        self.steps = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def run(self, make_steps):
+        try:
+            for step in make_steps():
+                with self.condition:
+                    self.steps.append(step)
+                    self.condition.notify_all()
+        except Exception as error:  # Raised in every replay instead
+            self.error = error
+        with self.condition:
+            self.done = True
+            self.condition.notify_all()
+
+    def replay(self):
+        i = 0
+        while True:
+            with self.condition:
+                while i == len(self.steps) and not self.done:
+                    self.condition.wait()
+                end = len(self.steps)
+                if i == end:
+                    if self.error is not None:
+                        raise self.error
+                    return
+            for j in range(i, end):  # Recorded steps never change, so they are read outside the lock
+                yield self.steps[j]
+            i = end
+
+
+trace_cache = TraceCache()
@@ -0,0 +1,165 @@
+import numpy as np
+from matplotlib.patches import Rectangle
+from keymap import release_keys
+from ingest import CHUNK_SIZE
+
+VIEWPORT_SIZE = 64  # Elements drawn at once; shorter arrays are drawn whole, as before
+MIN_VIEWPORT_SIZE = 8
+LABEL_LIMIT = 64  # Value labels and tick labels are skipped when more bars than this are visible
+MINIMAP_POINTS = 512  # Downsampled columns in the minimap
+MINIMAP_RECT = [0.125, 0.075, 0.775, 0.035]
+# Handled by on_key; by default 'f' toggles fullscreen and the arrows step the toolbar's view history
+NAVIGATION_KEYS = ['left', 'right', '+', '=', '-', 'f']
+
+
+class Viewport:
+    def __init__(self, fig, values, on_change=None, size=VIEWPORT_SIZE, minimap=True):
+        self.fig = fig
+        self.n = len(values)
+        self.enabled = self.n > size
+        self.size = size if self.enabled else self.n
+        self.start = 0
+        self.follow = True
+        self.on_change = on_change
+        self.minimap_ax = None
+        release_keys(*NAVIGATION_KEYS)
+        if self.enabled and minimap:
+            self.init_minimap(values)
+
+    @property
+    def end(self):
+        return min(self.start + self.size, self.n)
+
+    @property
+    def show_labels(self):
+        return self.end - self.start <= LABEL_LIMIT
+
+    def visible(self, i):
+        return self.start <= i < self.end
+
+    def show(self, l, r=None):
+        # Follow mode: move the window so [l, r] is visible; returns True if it moved
+        r = l if r is None else r
+        if not self.enabled or not self.follow or (self.start <= l and r < self.end):
+            return False
+        if r - l + 1 >= self.size:
+            return self.move(l)
+        return self.move(l - (self.size - (r - l + 1)) // 2)  # Center the range
+
+    def move(self, start):
+        start = max(0, min(start, self.n - self.size))
+        moved = start != self.start
+        self.start = start
+        if moved and self.minimap_ax is not None:
+            self.window_patch.set_x(self.start)
+        return moved
+
+    def zoom(self, factor):
+        center = self.start + self.size // 2
+        self.size = max(MIN_VIEWPORT_SIZE, min(self.n, int(self.size * factor)))
+        if self.minimap_ax is not None:
+            self.window_patch.set_width(self.size)
+        self.move(center - self.size // 2)
+        return True
+
+    def on_key(self, key):
+        # Left/right pan, +/- zoom, 'f' toggles following the algorithm; returns True if the view changed
+        if not self.enabled:
+            return False
+        if key == 'left':
+            self.follow = False
+            return self.move(self.start - max(1, self.size // 2))
+        if key == 'right':
+            self.follow = False
+            return self.move(self.start + max(1, self.size // 2))
+        if key in ('+', '='):
+            return self.zoom(0.5)
+        if key == '-':
+            return self.zoom(2)
+        if key == 'f':
+            self.follow = not self.follow
+            return True
+        return False
+
+    def window(self, values):
+        return values[self.start:self.end]
+
+    def status(self, window, prefix='Current Array'):
+        # Formats the visible values only, never the whole array
+        if not self.enabled:
+            return f'{prefix}: {window}'
+        follow = 'following' if self.follow else 'free (press f to follow)'
+        return (f'{prefix} [{self.start}:{self.start + len(window)}] of {self.n}, {follow}: '
+                f'{[int(value) for value in window]}')
+
+    def range_text(self, values, l, r):
+        # values[l:r + 1], truncated to what the viewport would show
+        if r - l + 1 <= self.size:
+            return str(values[l:r + 1])
+        head = [int(value) for value in values[l:l + self.size // 2]]
+        return f'{str(head)[:-1]}, ... ({r - l + 1} elements)]'
+
+    def init_minimap(self, values):
+        self.block = -(-self.n // MINIMAP_POINTS)  # Elements per minimap column
+        self.points = self.downsample(values, 0, self.n)
+
+        self.fig.subplots_adjust(bottom=0.17)
+        self.minimap_ax = self.fig.add_axes(MINIMAP_RECT)
+        self.minimap_ax.set_xticks([])
+        self.minimap_ax.set_yticks([])
+        self.minimap_line, = self.minimap_ax.plot(np.arange(len(self.points)) * self.block, self.points,
+                                                  color='steelblue', linewidth=0.8)
+        self.minimap_ax.set_xlim(0, self.n)
+        low, high = float(self.points.min()), float(self.points.max())
+        self.minimap_ax.set_ylim(min(low, 0), high + 1)
+        self.window_patch = Rectangle((self.start, min(low, 0)), self.size, high + 1 - min(low, 0),
+                                      color='orange', alpha=0.3)
+        self.minimap_ax.add_patch(self.window_patch)
+        self.click_cid = self.fig.canvas.mpl_connect('button_press_event', self.on_minimap_click)
+
+    def downsample(self, values, first_block, last_block):
+        # Max of each block, so spikes stay visible. Taken in the values' own dtype over reshaped views of
+        # about CHUNK_SIZE elements, so no widened or padded copy of the array is made; a short last block
+        # is reduced on its own
+        segment = np.asarray(values)[first_block * self.block:last_block * self.block]
+        full = len(segment) // self.block
+        points = np.empty(-(-len(segment) // self.block), dtype=segment.dtype)
+        step = max(1, CHUNK_SIZE // self.block)  # Blocks per chunk
+        for start in range(0, full, step):
+            stop = min(start + step, full)
+            points[start:stop] = segment[start * self.block:stop * self.block].reshape(-1, self.block).max(axis=1)
+        if full < len(points):
+            points[full] = segment[full * self.block:].max()
+        return points
+
+    def update_minimap(self, values, l, r):
+        # Recompute only the columns covering values[l:r + 1]
+        if self.minimap_ax is None:
+            return
+        first = l // self.block
+        last = r // self.block + 1
+        self.points[first:last] = self.downsample(values, first, last)
+        self.minimap_line.set_ydata(self.points)
+
+    def update_minimap_at(self, values, i):
+        # For writes that sweep left to right: a column is refreshed once, when its last element is written
+        if self.minimap_ax is not None and ((i + 1) % self.block == 0 or i == self.n - 1):
+            self.update_minimap(values, i, i)
+
+    def refresh_minimap(self, values):
+        if self.minimap_ax is not None:
+            self.update_minimap(values, 0, self.n - 1)
+
+    def on_minimap_click(self, event):
+        if event.inaxes is not self.minimap_ax or event.xdata is None:
+            return
+        self.follow = False
+        self.move(int(event.xdata) - self.size // 2)
+        if self.on_change is not None:
+            self.on_change()
+
+    def close(self):
+        if self.minimap_ax is not None:
+            self.fig.canvas.mpl_disconnect(self.click_cid)
+            self.fig.delaxes(self.minimap_ax)
+            self.minimap_ax = None
@@ -0,0 +1,87 @@
+import argparse
+import os
+import numpy as np
+from ingest import narrow
+
+WORKLOAD_KINDS = ["uniform", "sorted", "reversed", "nearly_sorted", "few_unique", "zipf", "gaussian", "wide_range"]
+MAX_WORKLOAD_SIZE = 10 ** 7
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "sorting_visualizer", "workloads")
+
+
+def generate_workload(kind="uniform", size=10, seed=None, low=1, high=100, use_cache=True):
+    if kind not in WORKLOAD_KINDS:
+        raise ValueError(f"Invalid workload kind '{kind}'. Choose one of: {', '.join(WORKLOAD_KINDS)}.")
+    size = int(size)
+    if size < 1 or size > MAX_WORKLOAD_SIZE:
+        raise ValueError(f"Workload size must be between 1 and {MAX_WORKLOAD_SIZE}.")
+    if low >= high:
+        raise ValueError("Workload range must satisfy low < high.")
+
+    # Only seeded workloads are reproducible, so only those are worth caching
+    cache_path = None
+    if use_cache and seed is not None:
+        cache_path = os.path.join(CACHE_DIR, f"{kind}-n{size}-s{seed}-r{low}_{high}.npy")
+        if os.path.exists(cache_path):
+            return narrow(np.load(cache_path))
+
+    # Generated as int64 so a seed keeps giving the same values, then stored in the narrowest type that fits
+    arr = narrow(_generate(kind, size, np.random.default_rng(seed), low, high))
+
+    if cache_path is not None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, arr)
+        os.replace(tmp_path, cache_path)  # Atomic, so concurrent runs never see a half-written file
+    return arr
+
+
+def _generate(kind, size, rng, low, high):
+    if kind == "uniform":
+        return rng.integers(low, high, size, dtype=np.int64)
+
+    if kind in ("sorted", "reversed", "nearly_sorted"):
+        arr = np.sort(rng.integers(low, high, size, dtype=np.int64))
+        if kind == "reversed":
+            return arr[::-1].copy()
+        if kind == "nearly_sorted" and size > 1:
+            # Swap about 1% of disjoint adjacent pairs
+            swaps = max(1, size // 100)
+            pos = 2 * rng.choice(size // 2, min(swaps, size // 2), replace=False)
+            arr[pos], arr[pos + 1] = arr[pos + 1], arr[pos].copy()
+        return arr
+
+    if kind == "few_unique":
+        distinct = rng.integers(low, high, min(8, high - low), dtype=np.int64)
+        return distinct[rng.integers(0, len(distinct), size)]
+
+    if kind == "zipf":
+        # Heavy head at `low`, long tail clipped to the range
+        return np.minimum(rng.zipf(1.5, size) + (low - 1), high - 1).astype(np.int64)
+
+    if kind == "gaussian":
+        mean = (low + high) / 2
+        std = (high - low) / 6  # Keeps ~99.7% of the values inside the range before clipping
+        return np.clip(np.rint(rng.normal(mean, std, size)), low, high - 1).astype(np.int64)
+
+    # wide_range ignores the small default range on purpose
+    return rng.integers(-10 ** 9, 10 ** 9, size, dtype=np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate (and cache) a sorting workload.")
+    parser.add_argument("kind", choices=WORKLOAD_KINDS)
+    parser.add_argument("size", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--low", type=int, default=1)
+    parser.add_argument("--high", type=int, default=100)
+    parser.add_argument("--output", help="Optional .npy path to copy the workload to")
+    args = parser.parse_args()
+
+    arr = generate_workload(args.kind, args.size, seed=args.seed, low=args.low, high=args.high)
+    if args.output:
+        np.save(args.output, arr)
+    print(f"{args.kind}: {len(arr)} elements, min={arr.min()}, max={arr.max()}, dtype={arr.dtype}")
+
+
+if __name__ == "__main__":
+    main()